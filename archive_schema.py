@@ -0,0 +1,20 @@
+# ==============================================================================
+# โครงสร้างไฟล์ Parquet ของ archive ใช้ร่วมกันระหว่าง weather_archive.py (เขียน) และ main_api.py (อ่าน)
+# แบ่งไฟล์ตามเดือนและจังหวัด: <ARCHIVE_DIR>/month=YYYY-MM/province_id=N/part-0.parquet
+# ==============================================================================
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+ARCHIVE_SCHEMA = pa.schema([
+    ("month", pa.string()),
+    ("province_id", pa.int16()),
+    ("province", pa.string()),
+    ("observed_at", pa.timestamp("s", tz="UTC")),
+    ("temperature_c", pa.float32()),
+    ("humidity_percent", pa.float32()),
+    ("condition", pa.string()),
+])
+ARCHIVE_PARTITIONING = ds.partitioning(
+    pa.schema([("month", pa.string()), ("province_id", pa.int16())]), flavor="hive"
+)
@@ -0,0 +1,12 @@
+# ==============================================================================
+# ชุด benchmark ของระบบ รันจากโฟลเดอร์หลักของโปรเจกต์ด้วย python -m benchmarks.<ชื่อโมดูล>
+#
+#   mock_tmd       - TMD API จำลองบนเครื่อง ปรับ latency / error / rate limit ได้
+#   generate_data  - เติมข้อมูลรายชั่วโมงจำลองหลายปีของทุกจังหวัดลง PostgreSQL
+#   load_api       - ยิงโหลดไปที่ main_api แล้ววัด throughput และ p50/p95/p99
+#   collector      - วัดเวลาทั้งรอบของ collector (กับ mock_tmd) และความเร็ว ingest (rows/sec)
+#   compare        - เทียบไฟล์ผลลัพธ์สองรอบ และคืน exit code 1 เมื่อช้าลงเกินเกณฑ์
+#
+# ผลลัพธ์ทุกตัวเขียนเป็น JSON ลง benchmarks/results/ (ดู results.py)
+# generate_data และ collector เขียนลงฐานข้อมูลจริง ควรใช้ DATABASE_URL ของฐานข้อมูลสำหรับ benchmark เท่านั้น
+# ==============================================================================
@@ -0,0 +1,154 @@
+# ==============================================================================
+# benchmark ของ collector (weather_script.py)
+#   end-to-end: รัน collect_weather_data() ทั้งรอบกับ mock TMD API ในเครื่อง แล้ววัดเวลาต่อรอบ
+#   ingest: วัด rows/sec ของ ingest_rows() สามแบบ คือ แถวใหม่, แถวซ้ำที่ค่าไม่เปลี่ยน และแถวที่ค่าเปลี่ยน
+#
+# ตัวอย่าง: DATABASE_URL=postgresql://.../weather_bench python -m benchmarks.collector --runs 3 --latency-ms 150
+# ==============================================================================
+
+import argparse
+import importlib
+import logging
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+import psycopg2
+
+from benchmarks.mock_tmd import add_server_arguments, server_options, start_mock_server
+from benchmarks.results import write_result
+from benchmarks.synthetic import BANGKOK_TZ, synthetic_observation
+
+# ช่วงเวลาที่ใช้วัด ingest อยู่ห่างจากข้อมูลจริง/ข้อมูลจำลอง และถูกลบก่อนวัดทุกครั้งเพื่อให้ผลเทียบกันได้
+INGEST_WINDOW_START = datetime(2000, 1, 1, tzinfo=BANGKOK_TZ)
+
+
+def load_collector(api_url, concurrency=None, rate_limit=None, rate_burst=None):
+    """
+    import weather_script หลังตั้ง env ให้ชี้ไปที่ mock server
+    (weather_script อ่านค่าตั้งค่าทั้งหมดตอน import)
+    """
+    os.environ.setdefault("TMD_TOKEN", "benchmark")
+    os.environ["TMD_API_URL"] = api_url
+    for name, value in (("TMD_CONCURRENCY", concurrency), ("TMD_RATE_LIMIT", rate_limit), ("TMD_RATE_BURST", rate_burst)):
+        if value is not None:
+            os.environ[name] = str(value)
+    return importlib.import_module("weather_script")
+
+
+def collector_totals(collector):
+    """ยอดสะสมจาก metrics ของ collector ใช้หาผลต่างก่อน/หลังแต่ละรอบ"""
+    totals = {"rows_parsed": 0.0, "fetch_retries": 0.0, "fetch_failures": 0.0, "ingest_seconds": 0.0}
+    for metric in collector.metrics_registry.collect():
+        for sample in metric.samples:
+            if sample.name == "weather_collector_rows_parsed_total":
+                totals["rows_parsed"] += sample.value
+            elif sample.name == "weather_collector_fetch_retries_total":
+                totals["fetch_retries"] += sample.value
+            elif sample.name == "weather_collector_fetch_seconds_count" and sample.labels.get("outcome") == "failed":
+                totals["fetch_failures"] += sample.value
+            elif sample.name == "weather_collector_ingest_seconds_sum":
+                totals["ingest_seconds"] += sample.value
+    return totals
+
+
+def end_to_end_benchmark(collector, server, runs):
+    durations = []
+    before = collector_totals(collector)
+    requests_before = dict(server.stats)
+    for run in range(runs):
+        started = time.monotonic()
+        collector.collect_weather_data()
+        durations.append(time.monotonic() - started)
+        logging.info(f"⏱️ รอบที่ {run + 1}/{runs}: {durations[-1]:.2f}s")
+    after = collector_totals(collector)
+    delta = {key: after[key] - before[key] for key in after}
+    total_seconds = sum(durations)
+    return {
+        "runs": runs,
+        "mean_seconds": round(total_seconds / runs, 3),
+        "min_seconds": round(min(durations), 3),
+        "max_seconds": round(max(durations), 3),
+        "rows_parsed": int(delta["rows_parsed"]),
+        "rows_per_sec": round(delta["rows_parsed"] / total_seconds, 1),
+        "fetch_retries": int(delta["fetch_retries"]),
+        "fetch_failures": int(delta["fetch_failures"]),
+        "ingest_mean_seconds": round(delta["ingest_seconds"] / runs, 3),
+        "mock_requests": {key: server.stats[key] - requests_before[key] for key in server.stats},
+    }
+
+
+def ingest_benchmark(collector, hours, seed):
+    rng = random.Random(seed)
+    rows = []
+    for province in collector.provinces:
+        for hour in range(hours):
+            observed_at = INGEST_WINDOW_START + timedelta(hours=hour)
+            rows.append((province, observed_at, *synthetic_observation(province, observed_at, rng)))
+    changed_rows = [(province, observed_at, tc + 0.5, rh, cond) for province, observed_at, tc, rh, cond in rows]
+
+    conn = psycopg2.connect(collector.DATABASE_URL)
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            f'DELETE FROM "{collector.TABLE_NAME}" WHERE "Observed_at" >= %s AND "Observed_at" < %s;',
+            (INGEST_WINDOW_START, INGEST_WINDOW_START + timedelta(hours=hours))
+        )
+        conn.commit()
+        cur.close()
+    finally:
+        conn.close()
+
+    metrics = {}
+    for name, batch in (("insert", rows), ("unchanged", rows), ("update", changed_rows)):
+        stats = collector.ingest_rows(batch)
+        if stats is None:
+            raise RuntimeError(f"ingest_rows ล้มเหลวระหว่างวัดแบบ {name}")
+        metrics[name] = {
+            "rows": len(batch),
+            "inserted": stats["inserted"],
+            "updated": stats["updated"],
+            "unchanged": stats["unchanged"],
+            "seconds": round(stats["seconds"], 3),
+            "rows_per_sec": round(len(batch) / stats["seconds"], 1),
+        }
+    return metrics
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="benchmark ของ collector กับ mock TMD API")
+    parser.add_argument("--runs", type=int, default=3, help="จำนวนรอบ end-to-end (0 = ข้าม)")
+    parser.add_argument("--ingest-hours", type=int, default=24 * 7, help="จำนวนชั่วโมงต่อจังหวัดในการวัด ingest (0 = ข้าม)")
+    parser.add_argument("--client-concurrency", type=int, default=None, help="TMD_CONCURRENCY ของ collector")
+    parser.add_argument("--client-rate", type=float, default=None, help="TMD_RATE_LIMIT ของ collector")
+    parser.add_argument("--client-burst", type=int, default=None, help="TMD_RATE_BURST ของ collector")
+    parser.add_argument("--output", help="ไฟล์ JSON ของผลลัพธ์ (ค่าเริ่มต้น benchmarks/results/)")
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    server = start_mock_server(**server_options(args))
+    logging.info(f"🌐 mock TMD API ที่ {server.url}")
+    try:
+        collector = load_collector(server.url, args.client_concurrency, args.client_rate, args.client_burst)
+        collector.check_and_create_table_if_needed()
+        metrics = {}
+        if args.runs > 0:
+            metrics["end_to_end"] = end_to_end_benchmark(collector, server, args.runs)
+        if args.ingest_hours > 0:
+            metrics["ingest"] = ingest_benchmark(collector, args.ingest_hours, args.seed or 42)
+
+        parameters = {
+            "runs": args.runs,
+            "ingest_hours": args.ingest_hours,
+            "provinces": len(collector.provinces),
+            "client": {
+                "concurrency": collector.FETCH_CONCURRENCY,
+                "rate_limit": collector.FETCH_RATE_PER_SEC,
+                "rate_burst": collector.FETCH_RATE_BURST,
+            },
+            "mock_server": server_options(args),
+        }
+        write_result("collector", parameters, metrics, args.output)
+    finally:
+        server.shutdown()
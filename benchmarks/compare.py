@@ -0,0 +1,87 @@
+# ==============================================================================
+# เทียบผล benchmark สองไฟล์ (baseline กับรอบปัจจุบัน) ใช้เป็น gate ใน CI ได้
+# exit code 1 เมื่อมี metric ที่แย่ลงเกิน --threshold เปอร์เซ็นต์
+#
+# ตัวอย่าง: python -m benchmarks.compare baseline.json benchmarks/results/load_api-....json --threshold 10
+# ==============================================================================
+
+import argparse
+import json
+import sys
+
+# ทิศทางของ metric ดูจากชื่อ (suffix) ตามที่ results.py กำหนด ส่วน metric อื่นแสดงอย่างเดียวไม่ใช้ตัดสิน
+HIGHER_IS_BETTER = ("_per_sec",)
+LOWER_IS_BETTER = ("_ms", "_seconds", "error_rate")
+# ค่าสูงสุดของรอบเดียวแกว่งมากเกินกว่าจะใช้ตัดสิน
+IGNORED = ("max_ms", "max_seconds")
+
+
+def flatten(metrics, prefix=""):
+    flat = {}
+    for key, value in metrics.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def direction(name):
+    if name.endswith(IGNORED):
+        return 0
+    if name.endswith(HIGHER_IS_BETTER):
+        return 1
+    if name.endswith(LOWER_IS_BETTER):
+        return -1
+    return 0
+
+
+def compare(baseline, current, threshold):
+    """คืนรายการ (ชื่อ, ค่าเดิม, ค่าใหม่, เปลี่ยนไปกี่ %, แย่ลงเกินเกณฑ์หรือไม่) ของ metric ที่มีทั้งสองไฟล์"""
+    old_metrics = flatten(baseline["metrics"])
+    new_metrics = flatten(current["metrics"])
+    rows = []
+    for name in sorted(old_metrics.keys() & new_metrics.keys()):
+        old, new = old_metrics[name], new_metrics[name]
+        sign = direction(name)
+        if old:
+            change = (new - old) / old * 100
+            regressed = bool(sign and -sign * change > threshold)
+        else:
+            # ฐานเป็น 0 คิดเปอร์เซ็นต์ไม่ได้: metric ยิ่งน้อยยิ่งดีที่เพิ่มจาก 0 ถือว่าแย่ลงเสมอ
+            change = None
+            regressed = sign < 0 and new > 0
+        if sign > 0 and old > 0 and new <= 0:
+            regressed = True # throughput ตกเป็น 0 แย่ลงเสมอไม่ว่า threshold จะเท่าไร
+        rows.append((name, old, new, change, regressed))
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="เทียบผล benchmark สองรอบ")
+    parser.add_argument("baseline", help="ไฟล์ผลลัพธ์ที่ใช้เป็นฐาน")
+    parser.add_argument("current", help="ไฟล์ผลลัพธ์รอบที่ต้องการตรวจ")
+    parser.add_argument("--threshold", type=float, default=10.0, help="เปอร์เซ็นต์ที่ยอมให้แย่ลงได้ (ค่าเริ่มต้น 10)")
+    args = parser.parse_args()
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.current, encoding="utf-8") as f:
+        current = json.load(f)
+    if baseline.get("benchmark") != current.get("benchmark"):
+        print(f"❌ เทียบ benchmark ต่างชนิดกันไม่ได้: {baseline.get('benchmark')} กับ {current.get('benchmark')}")
+        sys.exit(2)
+
+    print(f"{baseline.get('benchmark')}: {baseline.get('git_revision')} -> {current.get('git_revision')}")
+    rows = compare(baseline, current, args.threshold)
+    for name, old, new, change, regressed in rows:
+        change_text = f"{change:+.1f}%" if change is not None else "n/a"
+        marker = "❌" if regressed else ("  " if direction(name) == 0 else "✅")
+        print(f"{marker} {name:<45} {old:>12g} -> {new:>12g} ({change_text})")
+
+    regressions = [row for row in rows if row[4]]
+    if regressions:
+        print(f"❌ แย่ลงเกิน {args.threshold}% จำนวน {len(regressions)} metric")
+        sys.exit(1)
+    print("✅ ไม่มี metric ที่แย่ลงเกินเกณฑ์")
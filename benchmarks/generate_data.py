@@ -0,0 +1,121 @@
+# ==============================================================================
+# เติมข้อมูลรายชั่วโมงจำลองของทุกจังหวัดย้อนหลังหลายปีลง PostgreSQL สำหรับ benchmark
+# ใช้โครงสร้างตารางเดียวกับ weather_script.py (partition รายเดือน + ตาราง lookup) แล้วคำนวณ rollup ใหม่
+#
+# ตัวอย่าง: DATABASE_URL=postgresql://.../weather_bench python -m benchmarks.generate_data --years 3
+# ==============================================================================
+
+import argparse
+import csv
+import io
+import logging
+import os
+import random
+import time
+from datetime import date, datetime, timedelta
+
+import psycopg2
+
+# weather_script ตรวจ TMD_TOKEN ตอน import ซึ่งการสร้างข้อมูลจำลองไม่ได้ใช้
+os.environ.setdefault("TMD_TOKEN", "benchmark")
+import weather_script
+from benchmarks.results import write_result
+from benchmarks.synthetic import BANGKOK_TZ, synthetic_observation
+
+
+def month_starts(first, last):
+    month = first.replace(day=1)
+    while month <= last:
+        yield month
+        month = (month + timedelta(days=32)).replace(day=1)
+
+
+def month_rows(month, end, province_ids, rng):
+    """แถวรายชั่วโมงของทุกจังหวัดในเดือนเดียว (ไม่เกินวัน end) ตามลำดับคอลัมน์ของตารางหลัก"""
+    start = datetime.combine(month, datetime.min.time(), tzinfo=BANGKOK_TZ)
+    next_month = (month + timedelta(days=32)).replace(day=1)
+    stop = datetime.combine(min(next_month, end + timedelta(days=1)), datetime.min.time(), tzinfo=BANGKOK_TZ)
+    hours = int((stop - start).total_seconds() // 3600)
+    for province, province_id in province_ids.items():
+        for hour in range(hours):
+            observed_at = start + timedelta(hours=hour)
+            tc, rh, cond = synthetic_observation(province, observed_at, rng)
+            yield province_id, observed_at.isoformat(), tc, rh, cond
+
+
+def generate(years, end, seed):
+    weather_script.check_and_create_table_if_needed()
+    rng = random.Random(seed)
+    first = (end - timedelta(days=round(365.25 * years))).replace(day=1)
+    total_rows = inserted_rows = 0
+    started = time.monotonic()
+
+    conn = psycopg2.connect(weather_script.DATABASE_URL)
+    try:
+        cur = conn.cursor()
+        cur.execute(f'SELECT "Name", "id" FROM "{weather_script.PROVINCE_TABLE}";')
+        known = dict(cur.fetchall())
+        province_ids = {p: known[p] for p in weather_script.provinces if p in known}
+        cur.execute("""
+            CREATE TEMP TABLE weather_synthetic (
+                "Province_id" SMALLINT,
+                "Observed_at" TIMESTAMPTZ,
+                "Temperature_c" REAL,
+                "Humidity_percent" REAL,
+                "Condition_id" SMALLINT
+            );
+        """)
+        for month in month_starts(first, end):
+            month_started = time.monotonic()
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(month_rows(month, end, province_ids, rng))
+            buffer.seek(0)
+            weather_script.ensure_partitions(cur, [month])
+            cur.execute("TRUNCATE weather_synthetic;")
+            cur.copy_expert(f"COPY weather_synthetic ({weather_script.WEATHER_COLUMNS}) FROM STDIN WITH (FORMAT csv)", buffer)
+            staged = cur.rowcount
+            # รันซ้ำได้: แถวที่มีอยู่แล้วจะถูกข้าม
+            cur.execute(f"""
+                INSERT INTO "{weather_script.TABLE_NAME}" ({weather_script.WEATHER_COLUMNS})
+                SELECT {weather_script.WEATHER_COLUMNS} FROM weather_synthetic
+                ON CONFLICT DO NOTHING;
+            """)
+            inserted = cur.rowcount
+            conn.commit()
+            total_rows += staged
+            inserted_rows += inserted
+            logging.info(
+                f"🧪 {month:%Y-%m}: สร้าง {staged} แถว เพิ่มใหม่ {inserted} แถว ({time.monotonic() - month_started:.1f}s)"
+            )
+        cur.execute(f'ANALYZE "{weather_script.TABLE_NAME}";')
+        conn.commit()
+        cur.close()
+    finally:
+        conn.close()
+
+    load_seconds = time.monotonic() - started
+    rollup_started = time.monotonic()
+    weather_script.rebuild_rollups()
+    rollup_seconds = time.monotonic() - rollup_started
+    return {
+        "rows": total_rows,
+        "inserted": inserted_rows,
+        "provinces": len(province_ids),
+        "load_seconds": round(load_seconds, 3),
+        "load_rows_per_sec": round(total_rows / load_seconds, 1) if load_seconds else None,
+        "rollup_seconds": round(rollup_seconds, 3),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="เติมข้อมูลรายชั่วโมงจำลองลง PostgreSQL สำหรับ benchmark")
+    parser.add_argument("--years", type=float, default=3, help="จำนวนปีย้อนหลัง (ค่าเริ่มต้น 3)")
+    parser.add_argument("--end", type=date.fromisoformat, default=None, help="วันสุดท้ายของข้อมูล (YYYY-MM-DD, ค่าเริ่มต้นวันนี้)")
+    parser.add_argument("--seed", type=int, default=42, help="seed ของตัวสุ่ม เพื่อให้ได้ข้อมูลชุดเดิมทุกครั้ง")
+    parser.add_argument("--output", help="ไฟล์ JSON ของผลลัพธ์ (ค่าเริ่มต้น benchmarks/results/)")
+    args = parser.parse_args()
+
+    end = args.end or datetime.now(BANGKOK_TZ).date()
+    logging.info(f"🚀 เริ่มสร้างข้อมูลจำลอง {args.years} ปี ถึงวันที่ {end}")
+    metrics = generate(args.years, end, args.seed)
+    write_result("generate_data", {"years": args.years, "end": end.isoformat(), "seed": args.seed}, metrics, args.output)
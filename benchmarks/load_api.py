@@ -0,0 +1,149 @@
+# ==============================================================================
+# load generator ของ main_api: worker หลายเธรดยิงคำขอแบบ closed-loop ตามสัดส่วนของแต่ละ route
+# จนครบเวลาที่กำหนด แล้วรายงาน throughput และ p50/p95/p99 ทั้งรวมและแยก route
+#
+# ตัวอย่าง: python -m benchmarks.load_api --url http://127.0.0.1:8000 --duration 30 --concurrency 16
+# ==============================================================================
+
+import argparse
+import logging
+import random
+import threading
+import time
+
+import requests
+
+from benchmarks.results import latency_summary, write_result
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler()]
+)
+
+# ชื่อ route -> (น้ำหนัก, ฟังก์ชันสร้าง (path, params) จากตัวสุ่มและรายชื่อจังหวัด)
+# สัดส่วนเริ่มต้นเลียนแบบ dashboard: ข้อมูลล่าสุดและรายจังหวัดถูกเรียกบ่อยที่สุด
+ROUTES = {
+    "weather": (4, lambda rng, provinces: ("/weather", {"province": rng.choice(provinces), "limit": 24})),
+    "latest": (4, lambda rng, provinces: ("/weather/latest", {})),
+    "batch": (1, lambda rng, provinces: ("/weather/batch", {"limit": 1})),
+    "series": (2, lambda rng, provinces: (
+        "/weather/series", {"province": rng.choice(provinces), "limit": 24 * 30, "points": 720}
+    )),
+    "aggregate": (1, lambda rng, provinces: (
+        "/weather/aggregate", {"province": rng.choice(provinces), "period": "month"}
+    )),
+}
+
+
+def load_provinces(base_url):
+    """ใช้รายชื่อจังหวัดที่ API มีข้อมูลจริง ถ้าเรียกไม่ได้ใช้กรุงเทพฯ อย่างเดียว"""
+    try:
+        response = requests.get(f"{base_url}/weather/latest", timeout=15)
+        response.raise_for_status()
+        provinces = [row["province"] for row in response.json()["data"]]
+    except (requests.exceptions.RequestException, KeyError, ValueError) as e:
+        logging.warning(f"⚠️ โหลดรายชื่อจังหวัดจาก API ไม่ได้ ({e}) ใช้กรุงเทพมหานครแทน")
+        provinces = []
+    return provinces or ["กรุงเทพมหานคร"]
+
+
+def worker(base_url, routes, provinces, seed, warmup_until, deadline, use_etag, samples):
+    """ยิงคำขอต่อเนื่องจนถึง deadline เก็บ (route, วินาที, สำเร็จหรือไม่) หลังช่วง warmup ลง samples"""
+    rng = random.Random(seed)
+    names = list(routes)
+    weights = [routes[name][0] for name in names]
+    etags = {}
+    session = requests.Session()
+    try:
+        while True:
+            started = time.perf_counter()
+            if started >= deadline:
+                return
+            name = rng.choices(names, weights)[0]
+            path, params = routes[name][1](rng, provinces)
+            key = (path, tuple(sorted(params.items())))
+            headers = {"If-None-Match": etags[key]} if use_etag and key in etags else {}
+            try:
+                response = session.get(f"{base_url}{path}", params=params, headers=headers, timeout=30)
+                response.content
+                ok = response.status_code in (200, 304)
+                if use_etag and "ETag" in response.headers:
+                    etags[key] = response.headers["ETag"]
+            except requests.exceptions.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - started
+            if started >= warmup_until:
+                samples.append((name, elapsed, ok))
+    finally:
+        session.close()
+
+
+def summarize(samples, seconds):
+    latencies = [elapsed for _, elapsed, _ in samples]
+    errors = sum(1 for _, _, ok in samples if not ok)
+    summary = {
+        "requests": len(samples),
+        "errors": errors,
+        "error_rate": round(errors / len(samples), 4) if samples else None,
+        "requests_per_sec": round(len(samples) / seconds, 2) if seconds else None,
+    }
+    summary.update(latency_summary(latencies))
+    return summary
+
+
+def run_load(base_url, route_names, duration, warmup, concurrency, use_etag, seed):
+    routes = {name: ROUTES[name] for name in route_names}
+    provinces = load_provinces(base_url)
+    samples = []
+    now = time.perf_counter()
+    warmup_until = now + warmup
+    deadline = warmup_until + duration
+    threads = [
+        threading.Thread(
+            target=worker,
+            args=(base_url, routes, provinces, seed + i, warmup_until, deadline, use_etag, samples)
+        )
+        for i in range(concurrency)
+    ]
+    logging.info(f"🔥 ยิงโหลด {concurrency} worker นาน {duration}s (warmup {warmup}s): {', '.join(routes)}")
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    metrics = {"overall": summarize(samples, duration), "routes": {}}
+    for name in routes:
+        metrics["routes"][name] = summarize([s for s in samples if s[0] == name], duration)
+    return metrics
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="load generator ของ main_api")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="base URL ของ main_api")
+    parser.add_argument("--duration", type=float, default=30, help="ระยะเวลาที่วัดผล (วินาที)")
+    parser.add_argument("--warmup", type=float, default=5, help="ช่วงอุ่นเครื่องที่ไม่นับผล (วินาที)")
+    parser.add_argument("--concurrency", type=int, default=16, help="จำนวน worker ที่ยิงพร้อมกัน")
+    parser.add_argument(
+        "--route", action="append", choices=list(ROUTES), dest="routes",
+        help="route ที่จะยิง (ระบุซ้ำได้, ค่าเริ่มต้นทุก route)"
+    )
+    parser.add_argument("--etag", action="store_true", help="ส่ง If-None-Match แบบเดียวกับ dashboard")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="ไฟล์ JSON ของผลลัพธ์ (ค่าเริ่มต้น benchmarks/results/)")
+    args = parser.parse_args()
+
+    base_url = args.url.rstrip("/")
+    route_names = args.routes or list(ROUTES)
+    metrics = run_load(base_url, route_names, args.duration, args.warmup, args.concurrency, args.etag, args.seed)
+    overall = metrics["overall"]
+    for name, summary in [("รวม", overall), *metrics["routes"].items()]:
+        logging.info(
+            f"📊 {name}: {summary['requests_per_sec']} req/s, p50 {summary['p50_ms']} ms, "
+            f"p95 {summary['p95_ms']} ms, p99 {summary['p99_ms']} ms, error {summary['errors']}"
+        )
+    parameters = {
+        "url": base_url, "routes": route_names, "duration": args.duration, "warmup": args.warmup,
+        "concurrency": args.concurrency, "etag": args.etag, "seed": args.seed,
+    }
+    write_result("load_api", parameters, metrics, args.output)
@@ -0,0 +1,197 @@
+# ==============================================================================
+# TMD API จำลองสำหรับทดสอบ collector โดยไม่ต้องเรียก data.tmd.go.th
+# ตอบ payload รูปแบบเดียวกับ /nwpapi/v1/forecast/location/hourly/place
+# ปรับ latency, อัตรา error (503) และ rate limit (429 + Retry-After) ได้
+#
+# ตัวอย่าง: python -m benchmarks.mock_tmd --port 8765 --latency-ms 150 --error-rate 0.05 --rate-limit 20
+# แล้วตั้ง TMD_API_URL=http://127.0.0.1:8765/nwpapi/v1/forecast/location/hourly/place ก่อนรัน weather_script.py
+# ==============================================================================
+
+import argparse
+import json
+import logging
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from benchmarks.synthetic import BANGKOK_TZ, synthetic_observation
+
+# --- 1. SETUP LOGGING ---
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler()]
+)
+
+# --- 2. CONFIGURATION ---
+FORECAST_PATH = "/nwpapi/v1/forecast/location/hourly/place"
+ALL_FIELDS = ("tc", "rh", "cond")
+
+
+# --- 3. MOCK SERVER ---
+class RateLimiter:
+    """token bucket แบบไม่รอ: ถ้าโควตาหมดให้ตอบ 429 ทันที เหมือน API จริงที่จำกัดอัตราการเรียก"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+
+class MockTMDServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency_ms=100, jitter_ms=30, error_rate=0.0,
+                 rate_limit=None, rate_burst=None, hours=1, stable=False, seed=None):
+        super().__init__(address, MockTMDHandler)
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.error_rate = error_rate
+        self.limiter = RateLimiter(rate_limit, rate_burst or max(1, int(rate_limit))) if rate_limit else None
+        self.hours = hours
+        # stable = ค่าของ (จังหวัด, ชั่วโมง) เดิมจะเหมือนเดิมทุกครั้ง ใช้ทดสอบเส้นทาง "ข้อมูลไม่เปลี่ยน" ของ collector
+        self.stable = stable
+        self.rng = random.Random(seed)
+        self.stats = {"requests": 0, "ok": 0, "errors": 0, "throttled": 0}
+        self._stats_lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}{FORECAST_PATH}"
+
+    def count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def forecasts(self, province, start, duration, fields):
+        result = []
+        for hour in range(duration):
+            observed_at = start + timedelta(hours=hour)
+            if self.stable:
+                rng = random.Random(f"{province}|{observed_at.isoformat()}")
+            else:
+                rng = random.Random(self.rng.random())
+            tc, rh, cond = synthetic_observation(province, observed_at, rng)
+            values = {"tc": tc, "rh": rh, "cond": cond}
+            result.append({
+                "time": observed_at.isoformat(),
+                "data": {field: values[field] for field in fields},
+            })
+        return result
+
+
+class MockTMDHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, body, headers=None):
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        server = self.server
+        server.count("requests")
+        url = urlparse(self.path)
+        if url.path != FORECAST_PATH:
+            self.send_json(404, {"error": "not found"})
+            return
+        if server.limiter and not server.limiter.try_acquire():
+            server.count("throttled")
+            retry_after = max(1, round(1 / server.limiter.rate))
+            self.send_json(429, {"error": "rate limit exceeded"}, {"Retry-After": str(retry_after)})
+            return
+
+        time.sleep(max(0.0, server.rng.gauss(server.latency, server.jitter)))
+        if server.rng.random() < server.error_rate:
+            server.count("errors")
+            self.send_json(503, {"error": "service unavailable"})
+            return
+
+        query = parse_qs(url.query)
+        province = query.get("province", [None])[0]
+        if not province:
+            self.send_json(400, {"error": "province is required"})
+            return
+        fields = [f for f in query.get("fields", [",".join(ALL_FIELDS)])[0].split(",") if f in ALL_FIELDS]
+        duration = int(query.get("duration", [server.hours])[0])
+        start = datetime.now(BANGKOK_TZ).replace(minute=0, second=0, microsecond=0)
+        server.count("ok")
+        self.send_json(200, {
+            "WeatherForecasts": [{
+                "location": {"province": province},
+                "forecasts": server.forecasts(province, start, duration, fields),
+            }]
+        })
+
+
+def start_mock_server(host="127.0.0.1", port=0, **options):
+    """เปิด mock server ในเธรดเบื้องหลัง (port=0 = สุ่ม port ว่าง) คืนตัว server ที่มี .url และ .stats"""
+    server = MockTMDServer((host, port), **options)
+    threading.Thread(target=server.serve_forever, name="mock-tmd", daemon=True).start()
+    return server
+
+
+def add_server_arguments(parser):
+    parser.add_argument("--latency-ms", type=float, default=100, help="latency เฉลี่ยต่อคำขอ (มิลลิวินาที)")
+    parser.add_argument("--jitter-ms", type=float, default=30, help="ส่วนเบี่ยงเบนมาตรฐานของ latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="สัดส่วนคำขอที่ตอบ 503 (0-1)")
+    parser.add_argument("--rate-limit", type=float, default=None, help="จำนวนคำขอต่อวินาทีที่ยอมรับ เกินแล้วตอบ 429")
+    parser.add_argument("--rate-burst", type=int, default=None, help="จำนวนคำขอที่ยอมให้ติดกันก่อนโดนจำกัด")
+    parser.add_argument("--hours", type=int, default=1, help="จำนวนชั่วโมงพยากรณ์ต่อ payload เมื่อไม่ส่ง duration")
+    parser.add_argument("--stable", action="store_true", help="ให้ค่าของจังหวัด/ชั่วโมงเดิมเหมือนเดิมทุกครั้ง")
+    parser.add_argument("--seed", type=int, default=None, help="seed ของตัวสุ่ม latency/error/ค่าพยากรณ์")
+
+
+def server_options(args):
+    return {
+        "latency_ms": args.latency_ms,
+        "jitter_ms": args.jitter_ms,
+        "error_rate": args.error_rate,
+        "rate_limit": args.rate_limit,
+        "rate_burst": args.rate_burst,
+        "hours": args.hours,
+        "stable": args.stable,
+        "seed": args.seed,
+    }
+
+# --- 4. MAIN EXECUTION BLOCK ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="TMD API จำลองสำหรับ benchmark")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    server = start_mock_server(args.host, args.port, **server_options(args))
+    logging.info(f"🌐 mock TMD API พร้อมใช้งานที่ {server.url} (กด Ctrl+C เพื่อหยุด)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        logging.info(f"🛑 หยุด mock server: {server.stats}")
+    finally:
+        server.shutdown()
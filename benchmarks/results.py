@@ -0,0 +1,68 @@
+# ==============================================================================
+# เขียนผล benchmark เป็น JSON พร้อมข้อมูลของรอบที่รัน (commit, เครื่อง, พารามิเตอร์)
+# ชื่อ metric ใช้หน่วยเป็น suffix เพื่อให้ compare.py รู้ทิศทาง:
+#   *_per_sec ยิ่งมากยิ่งดี, *_ms / *_seconds / error_rate ยิ่งน้อยยิ่งดี
+# ==============================================================================
+
+import json
+import logging
+import math
+import os
+import platform
+import subprocess
+from datetime import datetime, timezone
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def latency_summary(samples):
+    """สรุป latency (วินาที) เป็นมิลลิวินาทีแบบ nearest-rank percentile"""
+    if not samples:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "mean_ms": None, "max_ms": None}
+    ordered = sorted(samples)
+
+    def percentile(p):
+        index = max(0, math.ceil(p / 100 * len(ordered)) - 1)
+        return round(ordered[index] * 1000, 3)
+
+    return {
+        "p50_ms": percentile(50),
+        "p95_ms": percentile(95),
+        "p99_ms": percentile(99),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+def git_revision():
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return f"{revision}-dirty" if dirty else revision
+
+
+def write_result(name, parameters, metrics, output=None):
+    """บันทึกผลลง output (ถ้าไม่ระบุจะเป็น benchmarks/results/<name>-<เวลา>.json) แล้วคืน path"""
+    created_at = datetime.now(timezone.utc)
+    result = {
+        "benchmark": name,
+        "created_at": created_at.isoformat(),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "host": platform.node(),
+        "parameters": parameters,
+        "metrics": metrics,
+    }
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{name}-{created_at:%Y%m%dT%H%M%SZ}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    logging.info(f"📝 บันทึกผล benchmark ลง {output}")
+    return output
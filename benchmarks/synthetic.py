@@ -0,0 +1,48 @@
+# ==============================================================================
+# ค่าพยากรณ์อากาศจำลองที่ใช้ร่วมกันระหว่าง mock_tmd, generate_data และ collector benchmark
+# ==============================================================================
+
+import math
+import zlib
+from datetime import timedelta, timezone
+
+BANGKOK_TZ = timezone(timedelta(hours=7))
+
+# รหัสสภาพอากาศตาม cond_dict ใน weather_script.py
+RAIN_CONDITIONS = (5, 6, 7, 8)
+DRY_CONDITIONS = (1, 2, 3, 4)
+
+
+def province_offset(province):
+    """ค่าคงที่ของแต่ละจังหวัด (0-1) ใช้ให้แต่ละจังหวัดร้อน/ชื้นต่างกันเล็กน้อย"""
+    return (zlib.crc32(province.encode("utf-8")) % 1000) / 1000
+
+
+def synthetic_observation(province, observed_at, rng):
+    """
+    คืน (อุณหภูมิ, ความชื้น, รหัสสภาพอากาศ) ของจังหวัดและเวลาที่ระบุ
+    อุณหภูมิขึ้นลงตามฤดู (ร้อนสุดช่วงเมษายน) และตามช่วงเวลาของวัน (สูงสุดราวบ่ายสามโมง)
+    ความชื้นสวนทางกับอุณหภูมิและสูงขึ้นในฤดูฝน
+    """
+    local = observed_at.astimezone(BANGKOK_TZ)
+    day_of_year = local.timetuple().tm_yday
+    offset = province_offset(province)
+    seasonal = 3.0 * math.sin(2 * math.pi * (day_of_year - 15) / 365)
+    diurnal = 4.0 * math.sin(2 * math.pi * (local.hour - 9) / 24)
+    noise = rng.gauss(0, 0.8)
+    temperature = 26.5 + 3 * offset + seasonal + diurnal + noise
+    rainy_season = max(0.0, math.sin(2 * math.pi * (day_of_year - 120) / 365))
+    humidity = 72 + 8 * offset + 15 * rainy_season - 2.5 * (diurnal + noise)
+    humidity = min(100.0, max(25.0, humidity))
+
+    if humidity > 88 or rng.random() < 0.35 * rainy_season:
+        condition = rng.choice(RAIN_CONDITIONS)
+    elif temperature >= 37:
+        condition = 12
+    elif temperature < 16:
+        condition = 10
+    elif temperature < 20:
+        condition = 11
+    else:
+        condition = rng.choice(DRY_CONDITIONS)
+    return round(temperature, 2), round(humidity, 2), condition
@@ -1,9 +1,28 @@
-from fastapi import FastAPI, Query
-from typing import Optional
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import List, Literal, Optional
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+import asyncio
 import asyncpg
+import base64
+import csv
+import hashlib
+import io
+import json
+import logging
 import os
+import threading
+import time
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
 from dotenv import load_dotenv
-from datetime import date
+from archive_schema import ARCHIVE_PARTITIONING, ARCHIVE_SCHEMA
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from datetime import date, datetime, timedelta, timezone
 
 load_dotenv()
 app = FastAPI()
@@ -15,16 +34,431 @@ app = FastAPI()
 # DB_HOST = "localhost"
 # DB_PORT = "5432"
 TABLE_NAME = "Weather"
+PROVINCE_TABLE = f"{TABLE_NAME}_province"
+CONDITION_TABLE = f"{TABLE_NAME}_condition"
 DATABASE_URL = os.getenv("DATABASE_URL")
+INGEST_CHANNEL = os.getenv("INGEST_CHANNEL", "weather_ingest")
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "512"))
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "900"))
+GZIP_MIN_BYTES = int(os.getenv("GZIP_MIN_BYTES", "1024"))
+EXPORT_PREFETCH_ROWS = int(os.getenv("EXPORT_PREFETCH_ROWS", "2000"))
+EXPORT_CHUNK_BYTES = 64 * 1024
+SNAPSHOT_POLL_SECONDS = float(os.getenv("SNAPSHOT_POLL_SECONDS", "60"))
+LISTEN_RETRY_SECONDS = float(os.getenv("LISTEN_RETRY_SECONDS", "5"))
+SERIES_MAX_ROWS = int(os.getenv("SERIES_MAX_ROWS", "100000"))
+# ผลลัพธ์ทุกหน้าถูกเก็บใน cache จึงจำกัดขนาดต่อ request ไว้ ข้อมูลย้อนหลังยาวๆ ใช้ cursor หรือ /weather/export แทน
+PAGE_MAX_ROWS = int(os.getenv("PAGE_MAX_ROWS", "5000"))
+BATCH_MAX_ROWS_PER_PROVINCE = int(os.getenv("BATCH_MAX_ROWS_PER_PROVINCE", "168"))
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archive")
+
+# ตารางหลักเก็บเวลาเป็น timestamptz และรหัสจังหวัด/สภาพอากาศ
+# API แปลงกลับเป็นวันที่/เวลาตามเวลาประเทศไทยและชื่อเต็ม เพื่อให้ response เหมือนเดิม
+LOCAL_TZ = "Asia/Bangkok"
+BANGKOK_TZ = timezone(timedelta(hours=7))
+LOCAL_DATE_SQL = f"""(w."Observed_at" AT TIME ZONE '{LOCAL_TZ}')::date"""
+LOCAL_TIME_SQL = f"""(w."Observed_at" AT TIME ZONE '{LOCAL_TZ}')::time"""
+
+
+def local_midnight(day):
+    return datetime.combine(day, datetime.min.time(), tzinfo=BANGKOK_TZ)
+
+# บีบอัด response ที่ใหญ่กว่าเกณฑ์ด้วย gzip เมื่อ client รองรับ
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MIN_BYTES)
+
+# ---------- Response Cache ----------
+class ResponseCache:
+    """
+    LRU + TTL cache สำหรับผลลัพธ์ของ query
+    แต่ละรายการจำไว้ว่าครอบคลุมจังหวัดใดบ้าง (None = ทุกจังหวัด) เพื่อล้างเฉพาะส่วนที่ข้อมูลเปลี่ยน
+    """
+
+    def __init__(self, max_entries, ttl_seconds):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, _, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, provinces=None):
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, provinces, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, provinces=None):
+        """ล้างรายการที่เกี่ยวข้องกับจังหวัดที่ระบุ ถ้าไม่ระบุจะล้างทั้งหมด"""
+        if provinces is None:
+            stale = list(self._entries)
+        else:
+            changed = set(provinces)
+            stale = [
+                key for key, (_, scope, _) in self._entries.items()
+                if scope is None or not changed.isdisjoint(scope)
+            ]
+        for key in stale:
+            del self._entries[key]
+        self.invalidations += len(stale)
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+response_cache = ResponseCache(CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS)
+
+# ---------- Metrics ----------
+# label route ใช้ path template ของ route (เช่น /weather/series) ไม่ใช่ URL จริง เพื่อไม่ให้จำนวน series บานตามพารามิเตอร์
+REQUEST_SECONDS = Histogram(
+    "weather_api_request_seconds", "เวลาตอบ HTTP request แยกตาม route",
+    ["method", "route", "status"]
+)
+# แยกเวลาของงานที่ใช้ฐานข้อมูลเป็นช่วง: acquire = รอ connection จาก pool, query = รอผลจาก PostgreSQL,
+# convert = แปลงแถวเป็น response
+QUERY_PHASE_SECONDS = Histogram(
+    "weather_api_query_phase_seconds", "เวลาแต่ละช่วงของการ query แยกตาม route",
+    ["route", "phase"],
+    buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5)
+)
+POOL_WAITERS = Gauge("weather_api_db_pool_waiters", "จำนวนงานที่กำลังรอ connection จาก pool")
+
+
+class ApiStateCollector:
+    """อ่านสถานะ pool, cache และ snapshot ณ เวลาที่ Prometheus มาเก็บข้อมูล"""
+
+    def collect(self):
+        pool = getattr(app.state, "db_pool", None)
+        if pool is not None:
+            yield GaugeMetricFamily("weather_api_db_pool_size", "จำนวน connection ใน pool", value=pool.get_size())
+            yield GaugeMetricFamily("weather_api_db_pool_idle", "จำนวน connection ที่ว่างอยู่ใน pool", value=pool.get_idle_size())
+            yield GaugeMetricFamily("weather_api_db_pool_max_size", "ขนาดสูงสุดของ pool", value=pool.get_max_size())
+        stats = response_cache.stats()
+        yield GaugeMetricFamily("weather_api_cache_entries", "จำนวนรายการใน response cache", value=stats["entries"])
+        for name in ("hits", "misses", "evictions", "invalidations"):
+            yield CounterMetricFamily(f"weather_api_cache_{name}", f"จำนวน {name} ของ response cache", value=stats[name])
+        age = latest_snapshot.age_seconds()
+        if age is not None:
+            yield GaugeMetricFamily("weather_api_snapshot_age_seconds", "อายุของ snapshot ข้อมูลล่าสุด", value=age)
+
+
+
+@asynccontextmanager
+async def acquire_timed(pool, route):
+    """ยืม connection จาก pool พร้อมจับเวลารอ และนับจำนวนงานที่รออยู่"""
+    started = time.perf_counter()
+    with POOL_WAITERS.track_inprogress():
+        conn = await pool.acquire()
+    QUERY_PHASE_SECONDS.labels(route, "acquire").observe(time.perf_counter() - started)
+    try:
+        yield conn
+    finally:
+        await pool.release(conn)
+
+
+def query_phase(route, phase):
+    return QUERY_PHASE_SECONDS.labels(route, phase).time()
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        REQUEST_SECONDS.labels(
+            request.method, route.path if route else "unmatched", status
+        ).observe(time.perf_counter() - started)
+
+# ---------- Data Versions (ETag) ----------
+# รอบ ingest ล่าสุดที่ทำให้ข้อมูลของแต่ละจังหวัดเปลี่ยน ใช้เป็นเวอร์ชันของ response
+data_versions = {}
+# id สูงสุดของตาราง ingest ที่อ่านแล้ว รอบถัดไปอ่านเฉพาะแถวที่ใหม่กว่านี้
+data_versions_seen_id = 0
+# id ได้มาตอน INSERT แต่เห็นได้ตอน commit: รอบที่ได้ id ก่อนอาจ commit ทีหลัง จึงอ่านย้อนกลับไปเผื่อไว้
+DATA_VERSION_OVERLAP = 100
+
+
+async def load_data_versions(conn):
+    """
+    อ่านรอบ ingest ที่ใหม่กว่าที่เคยเห็นผ่าน primary key แทนการรวมทั้งตารางทุกครั้ง
+    (เรียกทุกรอบ poll ของ snapshot และหลังต่อ LISTEN ใหม่)
+    """
+    global data_versions_seen_id
+    try:
+        rows = await conn.fetch(f"""
+            SELECT p AS province, max("id") AS batch_id, max(max("id")) OVER () AS last_id
+            FROM "{TABLE_NAME}_ingest", unnest("Provinces") AS p
+            WHERE "id" > $1
+            GROUP BY p
+        """, data_versions_seen_id - DATA_VERSION_OVERLAP)
+    except asyncpg.UndefinedTableError:
+        return
+    for r in rows:
+        data_versions[r["province"]] = max(data_versions.get(r["province"], 0), r["batch_id"])
+    if rows:
+        data_versions_seen_id = max(data_versions_seen_id, rows[0]["last_id"])
+
+
+def data_version(provinces):
+    """
+    เวอร์ชันข้อมูลของจังหวัดที่ response ครอบคลุม (None = ทุกจังหวัด)
+    อ่านครั้งเดียวตอนเริ่ม request แล้วใส่ไว้ใน cache key: ถ้ามี ingest ระหว่างที่ query กำลังรัน
+    ผลลัพธ์เก่าจะถูกเก็บไว้ใต้ key ของเวอร์ชันเดิม ไม่ปนกับ request ที่มาหลังจากนั้น
+    """
+    if provinces is None:
+        return max(data_versions.values(), default=0)
+    return max((data_versions.get(p, 0) for p in provinces), default=0)
+
+
+def make_etag(cache_key):
+    """cache_key ต้องมีเวอร์ชันข้อมูลจาก data_version() อยู่แล้ว"""
+    digest = hashlib.blake2b(repr(cache_key).encode(), digest_size=8).hexdigest()
+    return f'W/"{digest}"'
+
+
+def etag_matches(request, etag):
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") == etag.removeprefix("W/") for tag in tags)
+
+
+# รหัสจังหวัดใช้เลือก partition ของไฟล์ archive โดยไม่ต้องถามฐานข้อมูลทุกครั้ง
+province_ids = {}
+
+
+async def load_province_ids(conn):
+    try:
+        rows = await conn.fetch(f'SELECT "id", "Name" FROM "{PROVINCE_TABLE}"')
+    except asyncpg.UndefinedTableError:
+        # ฐานข้อมูลใหม่หรือยังไม่ได้รัน weather_script.py --migrate-schema: snapshot จะลองโหลดใหม่ทุกรอบ
+        logging.warning(f"ยังไม่มีตาราง \"{PROVINCE_TABLE}\" กรุณารัน weather_script.py (--migrate-schema) ก่อน")
+        rows = []
+    province_ids.clear()
+    province_ids.update({r["Name"]: r["id"] for r in rows})
+
+# ---------- Latest Snapshot ----------
+class LatestObservation:
+    __slots__ = ("province", "date", "time", "temperature_c", "humidity_percent", "condition")
+
+    def __init__(self, province, date, time, temperature_c, humidity_percent, condition):
+        self.province = province
+        self.date = date
+        self.time = time
+        self.temperature_c = temperature_c
+        self.humidity_percent = humidity_percent
+        self.condition = condition
+
+    def as_dict(self):
+        return {
+            "province": self.province,
+            "date": self.date,
+            "time": self.time,
+            "temperature_c": self.temperature_c,
+            "humidity_percent": self.humidity_percent,
+            "condition": self.condition,
+        }
+
+
+class LatestSnapshot:
+    """
+    ข้อมูลล่าสุดของทุกจังหวัดเก็บไว้ในหน่วยความจำ ตอบ /weather/latest ได้โดยไม่ต้องแตะฐานข้อมูล
+    โหลดใหม่ทั้งชุดเมื่อมี NOTIFY จาก collector หรือทุก SNAPSHOT_POLL_SECONDS
+    """
+
+    def __init__(self):
+        self.observations = {}
+        self.refreshed_at = None
+        self.refreshed_monotonic = None
+        self.refresh_duration_ms = None
+        self.refresh_requested = asyncio.Event()
+
+    async def refresh(self, pool):
+        started = time.monotonic()
+        async with acquire_timed(pool, "snapshot") as conn:
+            with query_phase("snapshot", "query"):
+                try:
+                    rows = await conn.fetch(f"""
+                        SELECT p."Name" AS "Province", {LOCAL_DATE_SQL} AS "Date", {LOCAL_TIME_SQL} AS "Time",
+                            w."Temperature_c", w."Humidity_percent", c."Description" AS "Condition"
+                        FROM "{PROVINCE_TABLE}" p
+                        CROSS JOIN LATERAL (
+                            SELECT "Observed_at", "Temperature_c", "Humidity_percent", "Condition_id"
+                            FROM "{TABLE_NAME}"
+                            WHERE "Province_id" = p."id"
+                            ORDER BY "Observed_at" DESC
+                            LIMIT 1
+                        ) AS w
+                        LEFT JOIN "{CONDITION_TABLE}" c ON c."id" = w."Condition_id"
+                        ORDER BY p."Name"
+                    """)
+                except (asyncpg.UndefinedTableError, asyncpg.UndefinedColumnError):
+                    rows = [] # ตารางยังไม่ถูกสร้างหรือยังเป็นโครงสร้างแบบเดิม (ยังไม่ได้ migrate)
+        # สร้าง dict ใหม่แล้วสลับทีเดียว ผู้อ่านจะไม่เห็นข้อมูลครึ่งๆ กลางๆ
+        self.observations = {
+            r["Province"]: LatestObservation(
+                r["Province"], r["Date"].isoformat(), r["Time"].isoformat(),
+                r["Temperature_c"], r["Humidity_percent"], r["Condition"]
+            )
+            for r in rows
+        }
+        self.refreshed_at = datetime.now(timezone.utc)
+        self.refreshed_monotonic = time.monotonic()
+        self.refresh_duration_ms = (self.refreshed_monotonic - started) * 1000
+
+    async def run(self, pool):
+        """
+        วนรอ NOTIFY หรือครบรอบ poll แล้วโหลดข้อมูลใหม่
+        โหลดเวอร์ชันข้อมูล (ETag) ใหม่ด้วยทุกรอบ เผื่อ NOTIFY หายระหว่างที่ connection LISTEN หลุด
+        """
+        while True:
+            # ใช้ asyncio.wait แทน wait_for ซึ่งอาจกลืน cancel ตอน shutdown ถ้า event ถูก set พร้อมกันพอดี
+            waiter = asyncio.create_task(self.refresh_requested.wait())
+            try:
+                await asyncio.wait({waiter}, timeout=SNAPSHOT_POLL_SECONDS)
+            finally:
+                waiter.cancel()
+            self.refresh_requested.clear()
+            try:
+                await self.refresh(pool)
+                async with pool.acquire() as conn:
+                    await load_data_versions(conn)
+                    if not province_ids:
+                        await load_province_ids(conn) # เริ่ม API ก่อน migrate เสร็จ
+            except Exception:
+                # ห้ามให้ task นี้จบ ไม่อย่างนั้น /weather/latest จะค้างข้อมูลเดิมไปตลอด
+                logging.exception("โหลด snapshot ล่าสุดไม่สำเร็จ")
+
+    def age_seconds(self):
+        if self.refreshed_monotonic is None:
+            return None
+        return time.monotonic() - self.refreshed_monotonic
+
+
+latest_snapshot = LatestSnapshot()
+# ลงทะเบียนหลังสร้าง latest_snapshot เพราะ REGISTRY เรียก collect() ทันทีตอนลงทะเบียน
+REGISTRY.register(ApiStateCollector())
+
+
+def on_ingest_notify(connection, pid, channel, payload):
+    """รับ NOTIFY จาก collector หลัง commit ข้อมูลใหม่ แล้วล้าง cache และเลื่อนเวอร์ชันของจังหวัดที่เปลี่ยน"""
+    try:
+        message = json.loads(payload)
+        provinces = message["provinces"]
+    except (ValueError, KeyError, TypeError):
+        response_cache.invalidate()
+        latest_snapshot.refresh_requested.set()
+        return
+    batch_id = message.get("batch_id")
+    if batch_id is not None:
+        for province in provinces:
+            data_versions[province] = batch_id
+    response_cache.invalidate(provinces)
+    latest_snapshot.refresh_requested.set()
+
+
+# ---------- Ingest Listener ----------
+# ถือ connection หนึ่งเส้นไว้ LISTEN การแจ้งเตือนจาก collector ตลอดอายุของแอป ถ้าหลุด (เช่น DB restart) จะต่อใหม่เอง
+async def start_listener(pool):
+    conn = await pool.acquire()
+    try:
+        await conn.add_listener(INGEST_CHANNEL, on_ingest_notify)
+    except BaseException:
+        await pool.release(conn)
+        raise
+    conn.add_termination_listener(on_listener_terminated)
+    app.state.listen_conn = conn
+    return conn
+
+
+async def stop_listener(pool):
+    conn = app.state.listen_conn
+    app.state.listen_conn = None
+    if conn is None:
+        return
+    try:
+        conn.remove_termination_listener(on_listener_terminated)
+        await conn.remove_listener(INGEST_CHANNEL, on_ingest_notify)
+        await pool.release(conn)
+    except asyncpg.InterfaceError:
+        pass # connection หลุดและถูกคืนเข้า pool ไปแล้ว
+    except Exception:
+        logging.exception("ปิด connection LISTEN ไม่สำเร็จ")
+
+
+def on_listener_terminated(connection):
+    if app.state.listen_conn is not connection:
+        return
+    logging.warning("connection ที่ LISTEN การแจ้งเตือนหลุด กำลังเชื่อมต่อใหม่")
+    app.state.listen_task = asyncio.create_task(reconnect_listener(app.state.db_pool))
+
+
+async def reconnect_listener(pool):
+    """ต่อ LISTEN ใหม่จนสำเร็จ แล้วโหลดเวอร์ชันข้อมูลและล้าง cache เพราะ NOTIFY ระหว่างที่หลุดหายไปแล้ว"""
+    # pool คืน connection ที่หลุดเข้า pool ให้เองแล้ว ไม่ต้อง release ซ้ำ
+    app.state.listen_conn = None
+    while True:
+        try:
+            conn = await start_listener(pool)
+            await load_data_versions(conn)
+            break
+        except Exception:
+            logging.exception(f"เชื่อมต่อ LISTEN ใหม่ไม่สำเร็จ จะลองใหม่ในอีก {LISTEN_RETRY_SECONDS}s")
+            await stop_listener(pool)
+            await asyncio.sleep(LISTEN_RETRY_SECONDS)
+    response_cache.invalidate()
+    latest_snapshot.refresh_requested.set()
+    logging.info("เชื่อมต่อ LISTEN การแจ้งเตือนใหม่สำเร็จ")
 
 # ---------- DB Pool Setup ----------
 @app.on_event("startup")
 async def startup():
     app.state.db_pool = await asyncpg.create_pool(dsn=DATABASE_URL)
+    app.state.listen_task = None
+    await start_listener(app.state.db_pool)
+    await load_data_versions(app.state.listen_conn)
+    await load_province_ids(app.state.listen_conn)
+    await latest_snapshot.refresh(app.state.db_pool)
+    app.state.snapshot_task = asyncio.create_task(latest_snapshot.run(app.state.db_pool))
     
 
 @app.on_event("shutdown")
 async def shutdown():
+    tasks = [t for t in (app.state.snapshot_task, app.state.listen_task) if t]
+    for task in tasks:
+        task.cancel()
+    # รอให้ task หยุดจริงก่อนปิด pool ไม่อย่างนั้นงานที่ค้างอยู่จะเจอ "pool is closing"
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await stop_listener(app.state.db_pool)
     await app.state.db_pool.close()
 
 # ---------- Root ----------
@@ -32,9 +466,74 @@ async def shutdown():
 async def read_root():
     return {"message": "✅ ระบบ API พยากรณ์อากาศพร้อมใช้งานแล้วครับ!!"}
 
+# ---------- Weather Query Helpers ----------
+def weather_select(include_temp=True, include_humidity=True, include_condition=True):
+    query = f'SELECT w."Province_id", w."Observed_at", p."Name" AS "Province", {LOCAL_DATE_SQL} AS "Date", {LOCAL_TIME_SQL} AS "Time"'
+    if include_temp:
+        query += ', w."Temperature_c"'
+    if include_humidity:
+        query += ', w."Humidity_percent"'
+    if include_condition:
+        query += ', c."Description" AS "Condition"'
+    query += f' FROM "{TABLE_NAME}" w JOIN "{PROVINCE_TABLE}" p ON p."id" = w."Province_id"'
+    if include_condition:
+        query += f' LEFT JOIN "{CONDITION_TABLE}" c ON c."id" = w."Condition_id"'
+    return query + ' WHERE TRUE'
+
+
+def weather_filters(params, province=None, date_exact=None, date_from=None, date_to=None):
+    """สร้างเงื่อนไขกรองจังหวัด/ช่วงวันที่ของตารางหลัก (alias w) และเติมค่าลงใน params"""
+    query = ''
+    if province:
+        query += f' AND w."Province_id" = (SELECT "id" FROM "{PROVINCE_TABLE}" WHERE "Name" = $' + str(len(params)+1) + ')'
+        params.append(province)
+    if date_exact:
+        query += ' AND w."Observed_at" >= $' + str(len(params)+1) + ' AND w."Observed_at" < $' + str(len(params)+2)
+        params.extend([local_midnight(date_exact), local_midnight(date_exact + timedelta(days=1))])
+    if date_from:
+        query += ' AND w."Observed_at" >= $' + str(len(params)+1)
+        params.append(local_midnight(date_from))
+    if date_to:
+        query += ' AND w."Observed_at" < $' + str(len(params)+1)
+        params.append(local_midnight(date_to + timedelta(days=1)))
+    return query
+
+
+def weather_row(r, include_temp=True, include_humidity=True, include_condition=True):
+    data = {
+        "province": r["Province"],
+        "date": r["Date"].isoformat(),
+        "time": r["Time"].isoformat()
+    }
+    if include_temp:
+        data["temperature_c"] = r["Temperature_c"]
+    if include_humidity:
+        data["humidity_percent"] = r["Humidity_percent"]
+    if include_condition:
+        data["condition"] = r["Condition"]
+    return data
+
+
+# ---------- Keyset Cursor ----------
+# cursor คือคีย์ (Observed_at, Province_id) ของแถวสุดท้ายในหน้าก่อน เข้ารหัส base64 ให้ client ถือไว้แบบ opaque
+def encode_cursor(r):
+    raw = json.dumps([r["Observed_at"].isoformat(), r["Province_id"]]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        observed_at, province_id = json.loads(raw)
+        return datetime.fromisoformat(observed_at), int(province_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="cursor ไม่ถูกต้อง")
+
 # ---------- Weather API ----------
 @app.get("/weather")
 async def get_weather(
+    request: Request,
+    response: Response,
     province: Optional[str] = Query(default="กรุงเทพมหานคร", description="ชื่อจังหวัด"),
     date_exact: Optional[date] = Query(default=None, description="ดึงเฉพาะวันเดียว(YYYY-MM-DD)"),
     date_from: Optional[date] = Query(default=None, description="ดึงข้อมูลตั้งแต่วัน"),
@@ -42,51 +541,499 @@ async def get_weather(
     include_temp: Optional[bool] = Query(default=True, description="แสดงอุณหภูมิ"),
     include_humidity: Optional[bool] = Query(default=True, description="แสดงความชื้น"),
     include_condition: Optional[bool] = Query(default=True, description="แสดงสภาพอากาศ"),
-    limit: int = Query(default=100, description="จำนวนสูงสุดที่แสดง")
+    limit: int = Query(default=100, ge=1, le=PAGE_MAX_ROWS, description="จำนวนสูงสุดที่แสดง"),
+    cursor: Optional[str] = Query(default=None, description="ค่า X-Next-Cursor จากหน้าก่อน เพื่อดึงหน้าถัดไป")
+):
+    province = province or None
+    include_temp, include_humidity, include_condition = bool(include_temp), bool(include_humidity), bool(include_condition)
+    scope = None if province is None else (province,)
+    cache_key = (
+        "weather", province, date_exact, date_from, date_to,
+        include_temp, include_humidity, include_condition, limit, cursor, data_version(scope)
+    )
+    etag = make_etag(cache_key)
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+
+    cached = response_cache.get(cache_key)
+    if cached is None:
+        params = []
+        query = weather_select(include_temp, include_humidity, include_condition)
+        query += weather_filters(params, province, date_exact, date_from, date_to)
+        if cursor:
+            observed_at, province_id = decode_cursor(cursor)
+            # เงื่อนไข <= ซ้ำกับ row comparison แต่ planner ใช้ตัด partition ที่ใหม่กว่า cursor ทิ้งได้
+            query += ' AND w."Observed_at" <= $' + str(len(params)+1)
+            query += ' AND (w."Observed_at", w."Province_id") < ($' + str(len(params)+1) + ', $' + str(len(params)+2) + ')'
+            params.extend([observed_at, province_id])
+        query += ' ORDER BY w."Observed_at" DESC, w."Province_id" DESC LIMIT $' + str(len(params)+1)
+        params.append(limit)
+
+        async with acquire_timed(app.state.db_pool, "weather") as conn:
+            with query_phase("weather", "query"):
+                rows = await conn.fetch(query, *params)
+
+        with query_phase("weather", "convert"):
+            result = [weather_row(r, include_temp, include_humidity, include_condition) for r in rows]
+            next_cursor = encode_cursor(rows[-1]) if rows and len(rows) == limit else None
+        cached = (result, next_cursor)
+        response_cache.set(cache_key, cached, scope)
+
+    result, next_cursor = cached
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return result
+
+# ---------- Streaming Export ----------
+@app.get("/weather/export")
+async def export_weather(
+    province: Optional[str] = Query(default=None, description="ชื่อจังหวัด (ไม่ระบุ = ทุกจังหวัด)"),
+    date_from: Optional[date] = Query(default=None, description="ตั้งแต่วัน"),
+    date_to: Optional[date] = Query(default=None, description="ถึงวัน"),
+    format: Literal["ndjson", "csv"] = Query(default="ndjson", description="รูปแบบไฟล์ ndjson หรือ csv")
+):
+    """
+    ส่งออกข้อมูลทีละแถวผ่าน server-side cursor ของ asyncpg
+    หน่วยความจำคงที่ไม่ว่าช่วงข้อมูลจะยาวแค่ไหน
+    """
+    params = []
+    query = weather_select()
+    query += weather_filters(params, province, None, date_from, date_to)
+    query += ' ORDER BY w."Observed_at", w."Province_id"'
+    columns = ["province", "date", "time", "temperature_c", "humidity_percent", "condition"]
+
+    async def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if format == "csv":
+            writer.writerow(columns)
+        async with acquire_timed(app.state.db_pool, "export") as conn:
+            async with conn.transaction():
+                async for r in conn.cursor(query, *params, prefetch=EXPORT_PREFETCH_ROWS):
+                    data = weather_row(r)
+                    if format == "csv":
+                        writer.writerow([data[column] for column in columns])
+                    else:
+                        buffer.write(json.dumps(data, ensure_ascii=False))
+                        buffer.write("\n")
+                    if buffer.tell() >= EXPORT_CHUNK_BYTES:
+                        yield buffer.getvalue()
+                        buffer.seek(0)
+                        buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+
+    media_type = "text/csv; charset=utf-8" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(generate(), media_type=media_type)
+
+# ---------- Columnar Series API ----------
+def series_query(params, province, date_from, date_to, limit, points):
+    """
+    ดึงแถวล่าสุดไม่เกิน limit แถวของจังหวัดเดียว แล้วย่อเป็นช่วงเวลาเท่าๆ กันไม่เกิน points ช่วงในฐานข้อมูล
+    ความกว้างช่วงปัดขึ้นเป็นจำนวนเต็มชั่วโมง ถ้าข้อมูลไม่เกิน points (หรือไม่ระบุ) ความกว้างเป็น 1 วินาที ทุกแถวจึงเป็นช่วงของตัวเอง
+    """
+    filters = weather_filters(params, province, None, date_from, date_to)
+    params.extend([limit, points])
+    limit_param, points_param = f"${len(params) - 1}", f"${len(params)}::int"
+    return f"""
+        WITH obs AS (
+            SELECT w."Observed_at", w."Temperature_c", w."Humidity_percent", w."Condition_id"
+            FROM "{TABLE_NAME}" w
+            WHERE TRUE {filters}
+            ORDER BY w."Observed_at" DESC
+            LIMIT {limit_param}
+        ), bounds AS (
+            SELECT min("Observed_at") AS lo,
+                CASE WHEN {points_param} > 0 AND count(*) > {points_param}
+                    THEN ceil((extract(epoch FROM max("Observed_at") - min("Observed_at")) + 1) / {points_param} / 3600) * 3600
+                    ELSE 1
+                END AS width
+            FROM obs
+        ), buckets AS (
+            SELECT floor(extract(epoch FROM o."Observed_at" - b.lo) / b.width) AS n, b.lo, b.width, o.*
+            FROM obs o CROSS JOIN bounds b
+        )
+        SELECT (extract(epoch FROM s.lo) * 1000 + s.n * s.width * 1000)::bigint AS "Bucket_ms", s.width::int AS "Width",
+            s."Temperature_c", s."Humidity_percent", c."Description" AS "Condition", s."Samples"
+        FROM (
+            SELECT n, lo, width,
+                avg("Temperature_c")::real AS "Temperature_c",
+                avg("Humidity_percent")::real AS "Humidity_percent",
+                mode() WITHIN GROUP (ORDER BY "Condition_id") AS "Condition_id",
+                count(*)::int AS "Samples"
+            FROM buckets
+            GROUP BY n, lo, width
+        ) s
+        LEFT JOIN "{CONDITION_TABLE}" c ON c."id" = s."Condition_id"
+        ORDER BY s.n
+    """
+
+
+def series_arrow(series):
+    """เขียนผลลัพธ์แบบคอลัมน์เป็น Arrow IPC stream ชนิดข้อมูลตรงตามที่ใช้ในกราฟ"""
+    arrays = {"observed_at": pa.array(series["observed_at"], type=pa.timestamp("ms", tz=LOCAL_TZ))}
+    for name in ("temperature_c", "humidity_percent"):
+        if name in series:
+            arrays[name] = pa.array(series[name], type=pa.float32())
+    if "condition" in series:
+        arrays["condition"] = pa.array(series["condition"], type=pa.string()).dictionary_encode()
+    arrays["samples"] = pa.array(series["samples"], type=pa.int32())
+    table = pa.table(arrays).replace_schema_metadata({
+        "province": series["province"],
+        "bucket_seconds": str(series["bucket_seconds"]),
+    })
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+@app.get("/weather/series")
+async def get_weather_series(
+    request: Request,
+    province: str = Query(default="กรุงเทพมหานคร", description="ชื่อจังหวัด"),
+    date_from: Optional[date] = Query(default=None, description="ตั้งแต่วัน"),
+    date_to: Optional[date] = Query(default=None, description="ถึงวัน"),
+    include_temp: bool = Query(default=True, description="แสดงอุณหภูมิ"),
+    include_humidity: bool = Query(default=True, description="แสดงความชื้น"),
+    include_condition: bool = Query(default=True, description="แสดงสภาพอากาศ"),
+    limit: int = Query(default=24, ge=1, le=SERIES_MAX_ROWS, description="จำนวนชั่วโมงล่าสุดสูงสุดที่ใช้"),
+    points: Optional[int] = Query(default=None, ge=1, description="จำนวนจุดสูงสุด (เช่น ความกว้างกราฟเป็นพิกเซล) ข้อมูลที่ยาวกว่านี้จะถูกเฉลี่ยเป็นช่วง"),
+    format: Literal["json", "arrow"] = Query(default="json", description="json = array ต่อคอลัมน์, arrow = Arrow IPC stream")
+):
+    """
+    ข้อมูลย้อนหลังของจังหวัดเดียวแบบคอลัมน์ เรียงจากเก่าไปใหม่ พร้อมใช้สร้าง DataFrame/กราฟได้ทันที
+    observed_at เป็น epoch milliseconds (UTC) ของต้นช่วงเวลา, samples คือจำนวนชั่วโมงที่เฉลี่ยรวมในช่วงนั้น
+    """
+    scope = (province,)
+    cache_key = (
+        "series", province, date_from, date_to,
+        include_temp, include_humidity, include_condition, limit, points, format, data_version(scope)
+    )
+    etag = make_etag(cache_key)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    cached = response_cache.get(cache_key)
+    if cached is None:
+        params = []
+        query = series_query(params, province, date_from, date_to, limit, points)
+        async with acquire_timed(app.state.db_pool, "series") as conn:
+            with query_phase("series", "query"):
+                rows = await conn.fetch(query, *params)
+
+        with query_phase("series", "convert"):
+            series = {
+                "province": province,
+                "bucket_seconds": rows[0]["Width"] if rows else 1,
+                "observed_at": [r["Bucket_ms"] for r in rows],
+            }
+            if include_temp:
+                series["temperature_c"] = [r["Temperature_c"] for r in rows]
+            if include_humidity:
+                series["humidity_percent"] = [r["Humidity_percent"] for r in rows]
+            if include_condition:
+                series["condition"] = [r["Condition"] for r in rows]
+            series["samples"] = [r["Samples"] for r in rows]
+            cached = series_arrow(series) if format == "arrow" else series
+        response_cache.set(cache_key, cached, scope)
+
+    if format == "arrow":
+        return Response(content=cached, media_type=ARROW_STREAM_MEDIA_TYPE, headers=headers)
+    return JSONResponse(content=cached, headers=headers)
+
+# ---------- Latest Conditions API ----------
+@app.get("/weather/latest")
+async def get_weather_latest(
+    provinces: Optional[List[str]] = Query(default=None, description="รายชื่อจังหวัด (ไม่ระบุ = ทุกจังหวัด)")
+):
+    """สภาพอากาศล่าสุดจาก snapshot ในหน่วยความจำ ไม่มีการเรียกฐานข้อมูล"""
+    observations = latest_snapshot.observations
+    if provinces:
+        data = [observations[p].as_dict() for p in provinces if p in observations]
+    else:
+        data = [observation.as_dict() for observation in observations.values()]
+    age = latest_snapshot.age_seconds()
+    return {
+        "refreshed_at": latest_snapshot.refreshed_at.isoformat() if latest_snapshot.refreshed_at else None,
+        "snapshot_age_seconds": round(age, 3) if age is not None else None,
+        "refresh_duration_ms": round(latest_snapshot.refresh_duration_ms, 3) if latest_snapshot.refresh_duration_ms is not None else None,
+        "data": data,
+    }
+
+# ---------- Batch Weather API ----------
+@app.get("/weather/batch")
+async def get_weather_batch(
+    request: Request,
+    response: Response,
+    provinces: Optional[List[str]] = Query(default=None, description="รายชื่อจังหวัด (ไม่ระบุ = ทุกจังหวัด)"),
+    limit: int = Query(default=1, ge=1, le=BATCH_MAX_ROWS_PER_PROVINCE, description="จำนวนแถวล่าสุดต่อจังหวัด")
+):
+    """ดึงข้อมูลล่าสุด N แถวของหลายจังหวัด (หรือทั้งประเทศ) ใน query เดียว"""
+    scope = tuple(sorted(set(provinces))) if provinces else None
+    cache_key = ("batch", scope, limit, data_version(scope))
+    etag = make_etag(cache_key)
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    # LATERAL + LIMIT อ่าน primary key (Province_id, Observed_at) ย้อนหลังทีละจังหวัด แทนการเรียงทั้งตาราง
+    query = f"""
+        SELECT p."Name" AS "Province", {LOCAL_DATE_SQL} AS "Date", {LOCAL_TIME_SQL} AS "Time",
+            w."Temperature_c", w."Humidity_percent", c."Description" AS "Condition"
+        FROM "{PROVINCE_TABLE}" p
+        CROSS JOIN LATERAL (
+            SELECT "Observed_at", "Temperature_c", "Humidity_percent", "Condition_id"
+            FROM "{TABLE_NAME}"
+            WHERE "Province_id" = p."id"
+            ORDER BY "Observed_at" DESC
+            LIMIT $1
+        ) AS w
+        LEFT JOIN "{CONDITION_TABLE}" c ON c."id" = w."Condition_id"
+    """
+    params = [limit]
+    if scope is not None:
+        query += ' WHERE p."Name" = ANY($2::text[])'
+        params.append(list(scope))
+    query += ' ORDER BY p."Name", w."Observed_at" DESC'
+
+    async with acquire_timed(app.state.db_pool, "batch") as conn:
+        with query_phase("batch", "query"):
+            rows = await conn.fetch(query, *params)
+
+    with query_phase("batch", "convert"):
+        result = [
+            {
+                "province": r["Province"],
+                "date": r["Date"].isoformat(),
+                "time": r["Time"].isoformat(),
+                "temperature_c": r["Temperature_c"],
+                "humidity_percent": r["Humidity_percent"],
+                "condition": r["Condition"],
+            }
+            for r in rows
+        ]
+
+    response_cache.set(cache_key, result, scope)
+    return result
+
+# ---------- Historical Archive API ----------
+class ArchiveIndex:
+    """
+    ถือ dataset ของ ARCHIVE_DIR ไว้ใช้ซ้ำระหว่าง request และสร้างใหม่เมื่อไฟล์ใน archive เปลี่ยน
+    (ดูจาก mtime ของโฟลเดอร์ month=/province_id= ซึ่งเปลี่ยนทุกครั้งที่ weather_archive.py เขียนเดือนใหม่หรือเขียนทับ)
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._lock = threading.Lock()
+        self._signature = None
+        self._dataset = None
+        self.months = []
+
+    def _scan(self):
+        signature = []
+        with os.scandir(self.root) as months:
+            for month in months:
+                if not (month.is_dir() and month.name.startswith("month=")):
+                    continue
+                with os.scandir(month.path) as provinces:
+                    stamps = tuple(sorted((e.name, e.stat().st_mtime_ns) for e in provinces if e.is_dir()))
+                signature.append((month.name[len("month="):], month.stat().st_mtime_ns, stamps))
+        return tuple(sorted(signature))
+
+    def current(self):
+        """คืน (dataset, รายชื่อเดือนเรียงจากใหม่ไปเก่า) หรือ (None, []) ถ้ายังไม่มี archive"""
+        if not os.path.isdir(self.root):
+            return None, []
+        signature = self._scan()
+        with self._lock:
+            if signature != self._signature:
+                self._dataset = ds.dataset(
+                    self.root, schema=ARCHIVE_SCHEMA, format="parquet", partitioning=ARCHIVE_PARTITIONING,
+                    filesystem=pafs.LocalFileSystem(use_mmap=True)
+                )
+                self.months = sorted((month for month, _, _ in signature), reverse=True)
+                self._signature = signature
+            return self._dataset, self.months
+
+
+archive_index = ArchiveIndex(ARCHIVE_DIR)
+
+
+@app.get("/weather/history")
+def get_weather_history(
+    province: Optional[str] = Query(default="กรุงเทพมหานคร", description="ชื่อจังหวัด (ว่าง = ทุกจังหวัด)"),
+    date_from: Optional[date] = Query(default=None, description="ตั้งแต่วัน"),
+    date_to: Optional[date] = Query(default=None, description="ถึงวัน"),
+    include_temp: bool = Query(default=True, description="แสดงอุณหภูมิ"),
+    include_humidity: bool = Query(default=True, description="แสดงความชื้น"),
+    include_condition: bool = Query(default=True, description="แสดงสภาพอากาศ"),
+    limit: int = Query(default=1000, ge=1, description="จำนวนสูงสุดที่แสดง")
 ):
-    query = 'SELECT "Province", "Date", "Time"'
+    """
+    อ่านข้อมูลย้อนหลังจากไฟล์ Parquet ที่ weather_archive.py เขียนไว้ (memory-mapped) ไม่แตะ PostgreSQL
+    เลือกเฉพาะคอลัมน์ที่ต้องใช้ กรองจังหวัดด้วย partition และอ่านทีละเดือนจากใหม่ไปเก่าจนได้ครบ limit
+    """
+    dataset, months = archive_index.current()
+    if date_from:
+        months = [m for m in months if m >= f"{date_from:%Y-%m}"]
+    if date_to:
+        months = [m for m in months if m <= f"{date_to:%Y-%m}"]
+    if not months:
+        return []
+
+    # แปลงขอบเวลาให้เป็นชนิดเดียวกับคอลัมน์ในไฟล์ ไม่อย่างนั้น Arrow เทียบ timestamp ต่าง unit/timezone ไม่ได้
+    observed_type = ARCHIVE_SCHEMA.field("observed_at").type
+    conditions = []
+    if province:
+        if province in province_ids:
+            conditions.append(ds.field("province_id") == province_ids[province])
+        else:
+            conditions.append(ds.field("province") == province)
+    if date_from:
+        conditions.append(ds.field("observed_at") >= pa.scalar(local_midnight(date_from)).cast(observed_type))
+    if date_to:
+        conditions.append(ds.field("observed_at") < pa.scalar(local_midnight(date_to + timedelta(days=1))).cast(observed_type))
+    row_filter = None
+    for condition in conditions:
+        row_filter = condition if row_filter is None else row_filter & condition
+
+    columns = ["province", "observed_at"]
     if include_temp:
-        query += ', "Temperature_c"'
+        columns.append("temperature_c")
     if include_humidity:
-        query += ', "Humidity_percent"'
+        columns.append("humidity_percent")
     if include_condition:
-        query += ', "Condition"'
-    query += f' FROM "{TABLE_NAME}" WHERE TRUE'
+        columns.append("condition")
 
-    params = []
+    # เดือนใหม่กว่ามีเวลามากกว่าเสมอ เรียงภายในเดือนแล้วต่อกันได้เลย
+    tables = []
+    remaining = limit
+    for month in months:
+        month_filter = ds.field("month") == month
+        if row_filter is not None:
+            month_filter = month_filter & row_filter
+        table = dataset.to_table(columns=columns, filter=month_filter)
+        if table.num_rows == 0:
+            continue
+        table = table.sort_by([("observed_at", "descending"), ("province", "ascending")]).slice(0, remaining)
+        tables.append(table)
+        remaining -= table.num_rows
+        if remaining <= 0:
+            break
 
+    result = []
+    for table in tables:
+        for r in table.to_pylist():
+            observed_at = r.pop("observed_at").astimezone(BANGKOK_TZ)
+            data = {
+                "province": r.pop("province"),
+                "date": observed_at.date().isoformat(),
+                "time": observed_at.time().isoformat(),
+            }
+            data.update(r)
+            result.append(data)
+    return result
+
+# ---------- Aggregate API ----------
+# period -> (ตาราง rollup สถิติ, ตาราง rollup สภาพอากาศ, คอลัมน์ช่วงเวลา)
+ROLLUP_TABLES = {
+    "day": (f"{TABLE_NAME}_daily", f"{TABLE_NAME}_daily_condition", "Date"),
+    "month": (f"{TABLE_NAME}_monthly", f"{TABLE_NAME}_monthly_condition", "Month"),
+}
+
+
+@app.get("/weather/aggregate")
+async def get_weather_aggregate(
+    request: Request,
+    response: Response,
+    province: Optional[str] = Query(default="กรุงเทพมหานคร", description="ชื่อจังหวัด (ว่าง = ทุกจังหวัด)"),
+    period: Literal["day", "month"] = Query(default="day", description="สรุปรายวัน (day) หรือรายเดือน (month)"),
+    date_from: Optional[date] = Query(default=None, description="ตั้งแต่วัน"),
+    date_to: Optional[date] = Query(default=None, description="ถึงวัน"),
+    include_conditions: bool = Query(default=True, description="แสดงจำนวนชั่วโมงของแต่ละสภาพอากาศ")
+):
+    """สรุป min/max/mean ของอุณหภูมิและความชื้น พร้อมฮิสโตแกรมสภาพอากาศ จากตาราง rollup"""
+    province = province or None
+    scope = None if province is None else (province,)
+    cache_key = ("aggregate", province, period, date_from, date_to, include_conditions, data_version(scope))
+    etag = make_etag(cache_key)
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    stats_table, condition_table, period_column = ROLLUP_TABLES[period]
+    if include_conditions:
+        conditions_sql = f"""(
+            SELECT json_object_agg(c."Condition", c."Hours")
+            FROM "{condition_table}" c
+            WHERE c."Province" = r."Province" AND c."{period_column}" = r."{period_column}"
+        )"""
+    else:
+        conditions_sql = "NULL"
+    query = f"""
+        SELECT r."Province", r."{period_column}" AS "Period",
+            r."Temp_min", r."Temp_max", r."Temp_sum" / NULLIF(r."Temp_count", 0) AS "Temp_mean",
+            r."Humidity_min", r."Humidity_max", r."Humidity_sum" / NULLIF(r."Humidity_count", 0) AS "Humidity_mean",
+            r."Hours", {conditions_sql} AS "Conditions"
+        FROM "{stats_table}" r
+        WHERE TRUE
+    """
+    params = []
     if province:
-        query += ' AND "Province" = $' + str(len(params)+1)
         params.append(province)
-    if date_exact:
-        query += ' AND "Date" = $' + str(len(params)+1)
-        params.append(date_exact)
+        query += f' AND r."Province" = ${len(params)}'
     if date_from:
-        query += ' AND "Date" >= $' + str(len(params)+1)
-        params.append(date_from)
+        # เดือนที่มีวัน date_from อยู่ต้องถูกนับด้วย
+        params.append(date_from.replace(day=1) if period == "month" else date_from)
+        query += f' AND r."{period_column}" >= ${len(params)}'
     if date_to:
-        query += ' AND "Date" <= $' + str(len(params)+1)
         params.append(date_to)
+        query += f' AND r."{period_column}" <= ${len(params)}'
+    query += f' ORDER BY r."Province", r."{period_column}"'
 
-    query += ' ORDER BY "Date" DESC, "Time" DESC LIMIT $' + str(len(params)+1)
-    params.append(limit)
+    async with acquire_timed(app.state.db_pool, "aggregate") as conn:
+        with query_phase("aggregate", "query"):
+            rows = await conn.fetch(query, *params)
 
-    async with app.state.db_pool.acquire() as conn:
-        rows = await conn.fetch(query, *params)
-
-    result = []
-    for r in rows:
-        data = {
-            "province": r["Province"],
-            "date": r["Date"].isoformat(),
-            "time": r["Time"].isoformat()
-        }
-        if include_temp:
-            data["temperature_c"] = r["Temperature_c"]
-        if include_humidity:
-            data["humidity_percent"] = r["Humidity_percent"]
-        if include_condition:
-            data["condition"] = r["Condition"]
-        result.append(data)
+    with query_phase("aggregate", "convert"):
+        result = []
+        for r in rows:
+            data = {
+                "province": r["Province"],
+                "period": r["Period"].isoformat(),
+                "temperature_c": {"min": r["Temp_min"], "max": r["Temp_max"], "mean": r["Temp_mean"]},
+                "humidity_percent": {"min": r["Humidity_min"], "max": r["Humidity_max"], "mean": r["Humidity_mean"]},
+                "hours": r["Hours"],
+            }
+            if include_conditions:
+                data["conditions"] = json.loads(r["Conditions"]) if r["Conditions"] else {}
+            result.append(data)
 
+    response_cache.set(cache_key, result, scope)
     return result
+
+# ---------- Metrics API ----------
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return Response(content=generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
+
+# ---------- Cache Stats ----------
+@app.get("/cache/stats")
+async def get_cache_stats():
+    return response_cache.stats()
+
@@ -1,17 +1,29 @@
 # main_dashboard.py
 # วิธีรัน:
-# 1. ติดตั้งไลบรารีที่จำเป็น: pip install streamlit requests pandas
+# 1. ติดตั้งไลบรารีที่จำเป็น: pip install streamlit requests pandas pyarrow
 # 2. รันคำสั่งนี้ใน Terminal: streamlit run main_dashboard.py
 
 import streamlit as st
 import requests
 import pandas as pd
+import pyarrow as pa
 import time
 
 # --- CONFIGURATION ---
 # URL ของ API ที่คุณสร้างและรันไว้บน Render
 API_BASE_URL = 'https://weather-api-wj3x.onrender.com'
 
+# จำนวนจุดสูงสุดของกราฟ (ประมาณความกว้างเป็นพิกเซล) ช่วงเวลาที่ยาวกว่านี้ API จะเฉลี่ยย่อให้
+CHART_POINTS = 720
+
+# ช่วงเวลาย้อนหลังที่เลือกได้ -> จำนวนชั่วโมง
+HISTORY_RANGES = {
+    "24 ชั่วโมง": 24,
+    "7 วัน": 24 * 7,
+    "30 วัน": 24 * 30,
+    "1 ปี": 24 * 365,
+}
+
 # รายชื่อจังหวัด (ควรจะตรงกับใน API ของคุณ)
 PROVINCES = [
     "กรุงเทพมหานคร", "กระบี่", "กาญจนบุรี", "กาฬสินธุ์", "กำแพงเพชร", "ขอนแก่น", "จันทบุรี", "ฉะเชิงเทรา", "ชลบุรี", "ชัยนาท",
@@ -26,27 +38,96 @@ PROVINCES = [
 
 # --- FUNCTIONS ---
 
+# Session และ ETag ที่เก็บไว้ใช้ร่วมกันตลอดอายุของแอป (ไม่หายเมื่อ cache_data หมดอายุ)
+@st.cache_resource
+def get_http_session():
+    """
+    สร้าง requests.Session แบบ keep-alive ไว้ใช้ซ้ำทุกครั้งที่เรียก API
+    """
+    return requests.Session()
+
+@st.cache_resource
+def get_etag_store():
+    return {}
+
+def fetch_json(path, params, parse=requests.Response.json):
+    """
+    เรียก API แบบมีเงื่อนไข: ส่ง ETag ที่เคยได้ไปด้วย ถ้าข้อมูลไม่เปลี่ยน API จะตอบ 304 และใช้ข้อมูลเดิม
+    parse ใช้แปลง response (ค่าเริ่มต้นคือ JSON)
+    """
+    etags = get_etag_store()
+    key = (path, tuple(sorted(params.items())))
+    headers = {}
+    if key in etags:
+        headers["If-None-Match"] = etags[key][0]
+    response = get_http_session().get(f"{API_BASE_URL}{path}", params=params, headers=headers, timeout=15)
+    if response.status_code == 304:
+        return etags[key][1]
+    response.raise_for_status() # ทำให้เกิด Error ถ้า HTTP status ไม่ใช่ 2xx
+    data = parse(response)
+    if "ETag" in response.headers:
+        etags[key] = (response.headers["ETag"], data)
+    return data
+
+def format_reading(value, unit):
+    """
+    จัดรูปแบบค่าให้มีทศนิยม 2 ตำแหน่ง ถ้า TMD ไม่ได้ส่งค่ามา (None) แสดงเป็น "–"
+    """
+    return "–" if value is None else f"{value:.2f} {unit}"
+
+def read_arrow(response):
+    """
+    อ่าน Arrow IPC stream เป็น DataFrame ตรงๆ คอลัมน์มีชนิดข้อมูลมาแล้ว ไม่ต้องแปลงทีละแถว
+    """
+    return pa.ipc.open_stream(response.content).read_pandas()
+
 # ใช้ @st.cache_data เพื่อให้ Streamlit เก็บผลลัพธ์ไว้ ไม่ต้องดึงข้อมูลใหม่ทุกครั้งที่ผู้ใช้ทำอะไรเล็กๆ น้อยๆ
 @st.cache_data(ttl=300) # เก็บ cache ไว้ 5 นาที (300 วินาที)
 def fetch_weather_data(province, limit=24):
     """
-    ดึงข้อมูลสภาพอากาศจาก API ของเรา
+    ดึงข้อมูลย้อนหลังแบบคอลัมน์ (เรียงจากเก่าไปใหม่) จาก /weather/series
+    ช่วงเวลาที่ยาวเกิน CHART_POINTS จุด API จะเฉลี่ยย่อมาให้แล้ว
     """
     try:
-        url = f"{API_BASE_URL}/weather?province={province}&limit={limit}"
-        response = requests.get(url, timeout=15)
-        response.raise_for_status() # ทำให้เกิด Error ถ้า HTTP status ไม่ใช่ 2xx
-        data = response.json()
-        
-        # แปลงข้อมูล JSON เป็น Pandas DataFrame เพื่อให้ง่ายต่อการใช้งาน
-        df = pd.DataFrame(data)
-        # แปลงคอลัมน์ date และ time ให้เป็น datetime object
-        df['datetime'] = pd.to_datetime(df['date'].str.split('T').str[0] + ' ' + df['time'])
-        return df
+        df = fetch_json(
+            "/weather/series",
+            {"province": province, "limit": limit, "points": CHART_POINTS, "format": "arrow"},
+            parse=read_arrow
+        )
+        return df.set_index('observed_at')
     except requests.exceptions.RequestException as e:
         st.error(f"เกิดข้อผิดพลาดในการเชื่อมต่อ API: {e}")
         return pd.DataFrame() # คืนค่า DataFrame ว่างเปล่าถ้าเกิดข้อผิดพลาด
 
+@st.cache_data(ttl=300)
+def fetch_latest_data(province):
+    """
+    ดึงข้อมูลล่าสุดของจังหวัดจาก /weather/latest (ข้อมูลในกราฟอาจเป็นค่าเฉลี่ยของช่วงเวลา)
+    """
+    try:
+        data = fetch_json("/weather/latest", {"provinces": province})["data"]
+        return data[0] if data else None
+    except requests.exceptions.RequestException as e:
+        st.error(f"เกิดข้อผิดพลาดในการเชื่อมต่อ API: {e}")
+        return None
+
+@st.cache_data(ttl=300)
+def fetch_overview_data():
+    """
+    ดึงข้อมูลล่าสุดของทุกจังหวัดด้วยการเรียก API ครั้งเดียว
+    """
+    try:
+        data = fetch_json("/weather/batch", {"limit": 1})
+        df = pd.DataFrame(data)
+        if df.empty:
+            return df
+        df['datetime'] = pd.to_datetime(df['date']) + pd.to_timedelta(df['time'])
+        # เรียงตามลำดับใน PROVINCES และแสดงเฉพาะจังหวัดที่รู้จัก
+        return df.set_index('province').reindex(PROVINCES).dropna(how='all')
+    except requests.exceptions.RequestException as e:
+        st.error(f"เกิดข้อผิดพลาดในการเชื่อมต่อ API: {e}")
+        return pd.DataFrame()
+
 # --- STREAMLIT APP LAYOUT ---
 
 # ตั้งค่าหน้าเว็บ
@@ -73,30 +154,57 @@ st.markdown("แสดงข้อมูลล่าสุดที่ดึง
 
 # ส่วนควบคุม (Control Panel)
 st.sidebar.header("แผงควบคุม")
+view = st.sidebar.radio("มุมมอง:", ["รายจังหวัด", "ภาพรวมทั้งประเทศ"])
+
+if view == "ภาพรวมทั้งประเทศ":
+    overview_df = fetch_overview_data()
+    if overview_df.empty:
+        st.warning("ไม่สามารถโหลดข้อมูลได้ กรุณาลองใหม่อีกครั้ง")
+        st.stop()
+
+    st.subheader(f"สภาพอากาศล่าสุดทั่วประเทศ ({len(overview_df)} จังหวัด)")
+    col1, col2, col3 = st.columns(3)
+    col1.metric("อุณหภูมิเฉลี่ย", f"{overview_df['temperature_c'].mean():.2f} °C")
+    col2.metric("ร้อนที่สุด", f"{overview_df['temperature_c'].max():.2f} °C", overview_df['temperature_c'].idxmax(), delta_color="off")
+    col3.metric("ความชื้นเฉลี่ย", f"{overview_df['humidity_percent'].mean():.2f} %")
+
+    st.dataframe(
+        overview_df[['temperature_c', 'humidity_percent', 'condition', 'datetime']].rename(columns={
+            'temperature_c': 'อุณหภูมิ (°C)',
+            'humidity_percent': 'ความชื้น (%)',
+            'condition': 'สภาพอากาศ',
+            'datetime': 'เวลา',
+        }),
+        height=600
+    )
+
+    st.write("อุณหภูมิล่าสุดรายจังหวัด (°C)")
+    st.bar_chart(overview_df['temperature_c'])
+    st.stop()
+
 selected_province = st.sidebar.selectbox(
     "เลือกจังหวัด:",
     PROVINCES,
     index=PROVINCES.index("กรุงเทพมหานคร") # ตั้งค่าเริ่มต้นเป็นกรุงเทพฯ
 )
+selected_range = st.sidebar.selectbox("ช่วงเวลาย้อนหลัง:", list(HISTORY_RANGES))
 
 # ดึงข้อมูลตามจังหวัดที่เลือก
-data_df = fetch_weather_data(selected_province, limit=24)
-
-if not data_df.empty:
-    # ดึงข้อมูลแถวล่าสุด (ข้อมูลปัจจุบัน)
-    latest_data = data_df.iloc[0]
+data_df = fetch_weather_data(selected_province, limit=HISTORY_RANGES[selected_range])
+latest_data = fetch_latest_data(selected_province)
 
+if not data_df.empty and latest_data is not None:
     # แสดงเวลาที่อัปเดตล่าสุด
     st.sidebar.info(f"ข้อมูลล่าสุดของ {selected_province}")
-    st.sidebar.write(f"ณ วันที่: {latest_data['datetime'].strftime('%d/%m/%Y')}")
-    st.sidebar.write(f"เวลา: {latest_data['datetime'].strftime('%H:%M:%S')}")
+    st.sidebar.write(f"ณ วันที่: {pd.Timestamp(latest_data['date']).strftime('%d/%m/%Y')}")
+    st.sidebar.write(f"เวลา: {latest_data['time']}")
 
     # แสดงข้อมูลหลัก (Key Metrics)
     col1, col2, col3 = st.columns(3)
     
     # --- การปรับปรุง: จัดรูปแบบตัวเลขให้มีทศนิยม 2 ตำแหน่ง ---
-    temp_formatted = f"{latest_data['temperature_c']:.2f} °C"
-    humidity_formatted = f"{latest_data['humidity_percent']:.2f} %"
+    temp_formatted = format_reading(latest_data['temperature_c'], "°C")
+    humidity_formatted = format_reading(latest_data['humidity_percent'], "%")
     
     col1.metric("อุณหภูมิล่าสุด", temp_formatted)
     col2.metric("ความชื้นล่าสุด", humidity_formatted)
@@ -105,11 +213,11 @@ if not data_df.empty:
     with col3:
         st.write("สภาพอากาศล่าสุด")
         # ใช้ markdown เพื่อปรับขนาดและสไตล์ให้คล้ายกับ metric
-        st.markdown(f"<p style='font-size: 1.875rem; font-weight: bold; line-height: 1.2;'>{latest_data['condition']}</p>", unsafe_allow_html=True)
+        st.markdown(f"<p style='font-size: 1.875rem; font-weight: bold; line-height: 1.2;'>{latest_data['condition'] or '–'}</p>", unsafe_allow_html=True)
 
 
-    # เตรียมข้อมูลสำหรับกราฟ (เรียงจากเก่าไปใหม่)
-    chart_df = data_df.sort_values(by='datetime').set_index('datetime')
+    # ข้อมูลจาก API เรียงจากเก่าไปใหม่และมี index เป็นเวลาอยู่แล้ว ใช้วาดกราฟได้ทันที
+    chart_df = data_df
 
     # แสดงกราฟ
     st.subheader(f"แนวโน้มสภาพอากาศย้อนหลัง (จังหวัด{selected_province})")
@@ -0,0 +1,9 @@
+import os
+import sys
+
+# ให้ import weather_script และ benchmarks จากรากของ repo ได้ ไม่ว่าจะรัน pytest จากโฟลเดอร์ไหน
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# weather_script ตรวจ DATABASE_URL/TMD_TOKEN ตอน import แต่การทดสอบส่วนดึงข้อมูลไม่ได้ใช้ฐานข้อมูลจริง
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/weather_test")
+os.environ.setdefault("TMD_TOKEN", "test")
@@ -0,0 +1,75 @@
+# ==============================================================================
+# ทดสอบ fetch_all_provinces กับ TMD API จำลอง (benchmarks/mock_tmd.py)
+# ตรวจว่าไม่ยิงเกิน rate limit, ลองใหม่เมื่อเจอ 503 จนได้ครบทุกจังหวัด และใช้เวลาไม่เกินขอบเขต
+# ==============================================================================
+
+import threading
+import time
+
+import pytest
+
+import weather_script
+from benchmarks.mock_tmd import start_mock_server
+
+RATE_LIMIT = 10
+RATE_BURST = 10
+ERROR_RATE = 0.1
+
+
+@pytest.fixture
+def mock_tmd():
+    server = start_mock_server(latency_ms=20, jitter_ms=0, error_rate=ERROR_RATE, seed=1)
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture
+def collector(monkeypatch, mock_tmd):
+    monkeypatch.setattr(weather_script, "API_URL", mock_tmd.url)
+    monkeypatch.setattr(weather_script, "FETCH_RATE_PER_SEC", RATE_LIMIT)
+    monkeypatch.setattr(weather_script, "FETCH_RATE_BURST", RATE_BURST)
+    monkeypatch.setattr(weather_script, "FETCH_BACKOFF_BASE", 0.05)
+    # 503 สุ่ม 10% ต่อครั้ง ให้โอกาสลองใหม่มากพอที่ทุกจังหวัดจะสำเร็จแน่นอน
+    monkeypatch.setattr(weather_script, "FETCH_MAX_RETRIES", 6)
+    return weather_script
+
+
+def test_fetch_all_provinces_respects_rate_limit_and_retries(collector, mock_tmd):
+    provinces = collector.provinces
+    sent_at = []
+    lock = threading.Lock()
+
+    def record(response, *args, **kwargs):
+        with lock:
+            sent_at.append(time.monotonic())
+
+    session = collector.create_http_session()
+    session.hooks["response"].append(record)
+    started = time.monotonic()
+    try:
+        results = collector.fetch_all_provinces(provinces, session=session)
+    finally:
+        session.close()
+    elapsed = time.monotonic() - started
+
+    # ทุกจังหวัดต้องได้ payload ครบ แม้ว่าบางคำขอจะโดน 503
+    assert set(results) == set(provinces)
+    assert all(results[p] is not None for p in provinces)
+    stats = mock_tmd.stats
+    assert stats["errors"] > 0
+    assert stats["ok"] == len(provinces)
+    assert stats["requests"] == stats["ok"] + stats["errors"]
+    assert len(sent_at) == stats["requests"]
+
+    # ในช่วง 1 วินาทีใด ๆ ต้องไม่เกิน rate + burst และทั้งรอบต้องไม่เกินที่ token bucket อนุญาต
+    sent_at.sort()
+    busiest = max(
+        sum(1 for t in sent_at[i:] if t - start < 1.0)
+        for i, start in enumerate(sent_at)
+    )
+    assert busiest <= RATE_LIMIT + RATE_BURST
+    assert stats["requests"] <= RATE_LIMIT * elapsed + RATE_BURST
+
+    # รอบอ้างอิง 77 จังหวัด, 503 10%, จำกัด 10 req/s ใช้ราว 9 วินาที
+    expected = (stats["requests"] - RATE_BURST) / RATE_LIMIT
+    assert elapsed < expected + 3.0
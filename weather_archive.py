@@ -0,0 +1,217 @@
+# ==============================================================================
+# สคริปต์ย้ายข้อมูลเดือนที่ปิดแล้วจากตาราง "Weather" ไปเก็บเป็นไฟล์ Parquet (cold storage)
+# แบ่งไฟล์ตามเดือนและจังหวัด: <ARCHIVE_DIR>/month=YYYY-MM/province_id=N/part-0.parquet
+# ==============================================================================
+
+import argparse
+import json
+import logging
+import os
+import re
+import time
+from datetime import datetime, timedelta, timezone
+import psycopg2
+import psycopg2.errors
+import pyarrow as pa
+import pyarrow.dataset as ds
+from dotenv import load_dotenv
+from archive_schema import ARCHIVE_PARTITIONING, ARCHIVE_SCHEMA
+
+# --- 1. SETUP LOGGING ---
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler()]
+)
+
+# --- 2. CONFIGURATION ---
+load_dotenv()
+DATABASE_URL = os.getenv("DATABASE_URL")
+TABLE_NAME = os.getenv("TABLE_NAME", "Weather")
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archive")
+INGEST_CHANNEL = os.getenv("INGEST_CHANNEL", "weather_ingest") # ช่อง NOTIFY ที่ API ใช้ล้าง cache
+PROVINCE_TABLE = f"{TABLE_NAME}_province"
+CONDITION_TABLE = f"{TABLE_NAME}_condition"
+# detach/drop ต้องรอล็อก จำกัดเวลารอไว้ไม่ให้คิวล็อกไปขวาง export และการอ่านของ API
+ARCHIVE_LOCK_TIMEOUT = os.getenv("ARCHIVE_LOCK_TIMEOUT", "5s")
+ARCHIVE_LOCK_RETRIES = int(os.getenv("ARCHIVE_LOCK_RETRIES", "5"))
+BANGKOK_TZ = timezone(timedelta(hours=7))
+
+if not DATABASE_URL:
+    logging.critical("❌ CRITICAL: ไม่พบ DATABASE_URL ใน Environment Variables!")
+    exit(1)
+
+PARTITION_NAME = re.compile(rf"^{re.escape(TABLE_NAME)}_p(\d{{4}})(\d{{2}})$")
+
+# --- 3. ARCHIVE FUNCTIONS ---
+def list_monthly_partitions(cur):
+    """คืนรายการ (วันที่ 1 ของเดือน, ชื่อ partition) ของตารางหลัก เรียงจากเก่าไปใหม่"""
+    cur.execute("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE p.relname = %s;
+    """, (TABLE_NAME,))
+    partitions = []
+    for name, in cur.fetchall():
+        match = PARTITION_NAME.match(name)
+        if match:
+            partitions.append((datetime(int(match[1]), int(match[2]), 1).date(), name))
+    return sorted(partitions)
+
+
+def retry_on_lock_timeout(conn, action, description):
+    """รัน action ซ้ำเมื่อรอล็อกเกิน ARCHIVE_LOCK_TIMEOUT แทนการต่อคิวรอไปเรื่อยๆ คืน True เมื่อสำเร็จ"""
+    for attempt in range(ARCHIVE_LOCK_RETRIES):
+        try:
+            action()
+            return True
+        except psycopg2.errors.LockNotAvailable:
+            if not conn.autocommit:
+                conn.rollback()
+            delay = 2 ** attempt
+            logging.warning(f"⏳ รอล็อกเพื่อ{description} ไม่ทัน ({attempt + 1}/{ARCHIVE_LOCK_RETRIES}) ลองใหม่ในอีก {delay}s")
+            time.sleep(delay)
+    logging.error(f"❌ {description} ไม่สำเร็จ: รอล็อกไม่ได้ครบ {ARCHIVE_LOCK_RETRIES} ครั้ง")
+    return False
+
+
+def drop_partition(conn, partition, provinces):
+    """
+    แยก partition ออกด้วย DETACH PARTITION ... CONCURRENTLY (PostgreSQL 14+) ซึ่งไม่ขวางการอ่าน/เขียนตารางหลัก
+    แล้วจึง DROP พร้อมบันทึกรอบ ingest และ NOTIFY ให้ API ล้าง cache/ETag ของจังหวัดที่ข้อมูลหายไป
+    """
+    cur = conn.cursor()
+    conn.commit()
+    # CONCURRENTLY ใช้ใน transaction block ไม่ได้
+    conn.autocommit = True
+
+    def detach():
+        cur.execute("SET lock_timeout = %s;", (ARCHIVE_LOCK_TIMEOUT,))
+        cur.execute("SELECT inhdetachpending FROM pg_inherits WHERE inhrelid = to_regclass(%s);", (f'"{partition}"',))
+        row = cur.fetchone()
+        if row is None:
+            return # ถูก detach ไปแล้วจากรอบก่อน
+        # ถ้ารอบก่อนหยุดกลางทาง partition จะค้างสถานะ detach pending ต้องปิดงานด้วย FINALIZE
+        mode = "FINALIZE" if row[0] else "CONCURRENTLY"
+        cur.execute(f'ALTER TABLE "{TABLE_NAME}" DETACH PARTITION "{partition}" {mode};')
+
+    try:
+        detached = retry_on_lock_timeout(conn, detach, f"แยก partition {partition}")
+        cur.execute("RESET lock_timeout;")
+    finally:
+        conn.autocommit = False
+    if not detached:
+        cur.close()
+        return False
+
+    def drop():
+        cur.execute("SELECT set_config('lock_timeout', %s, true);", (ARCHIVE_LOCK_TIMEOUT,))
+        cur.execute(f'DROP TABLE IF EXISTS "{partition}";')
+        if provinces:
+            # เวอร์ชันข้อมูลของ API มาจากตาราง ingest จึงบันทึกการลบเป็นรอบหนึ่งด้วย
+            cur.execute(f"""
+                INSERT INTO "{TABLE_NAME}_ingest" ("Provinces", "Inserted", "Updated", "Unchanged")
+                VALUES (%s, 0, 0, 0)
+                RETURNING "id";
+            """, (provinces,))
+            batch_id = cur.fetchone()[0]
+            cur.execute("SELECT pg_notify(%s, %s);", (INGEST_CHANNEL, json.dumps(
+                {"batch_id": batch_id, "provinces": provinces}, ensure_ascii=False
+            )))
+        conn.commit()
+
+    dropped = retry_on_lock_timeout(conn, drop, f"ลบ partition {partition}")
+    cur.close()
+    return dropped
+
+
+def archive_partition(conn, month, partition, drop=False):
+    """
+    เขียนข้อมูลทั้งเดือนลง Parquet (เขียนทับเดือนเดิมถ้ามี จึงรันซ้ำได้)
+    ตรวจจำนวนแถวในไฟล์ให้ตรงกับฐานข้อมูลก่อน แล้วจึง detach/drop partition เมื่อระบุ drop
+    """
+    started = time.monotonic()
+    month_key = f"{month:%Y-%m}"
+    cur = conn.cursor()
+    cur.execute(f"""
+        SELECT w."Province_id", p."Name", w."Observed_at", w."Temperature_c", w."Humidity_percent", c."Description"
+        FROM "{partition}" w
+        JOIN "{PROVINCE_TABLE}" p ON p."id" = w."Province_id"
+        LEFT JOIN "{CONDITION_TABLE}" c ON c."id" = w."Condition_id"
+        ORDER BY w."Province_id", w."Observed_at";
+    """)
+    rows = cur.fetchall()
+    provinces = sorted({r[1] for r in rows})
+    if not rows:
+        logging.info(f"⏭️ {partition} ไม่มีข้อมูล")
+    else:
+        province_ids, names, observed_at, temperatures, humidities, conditions = zip(*rows)
+        table = pa.table({
+            "month": [month_key] * len(rows),
+            "province_id": province_ids,
+            "province": names,
+            "observed_at": observed_at,
+            "temperature_c": temperatures,
+            "humidity_percent": humidities,
+            "condition": conditions,
+        }, schema=ARCHIVE_SCHEMA)
+        ds.write_dataset(
+            table, ARCHIVE_DIR, format="parquet", partitioning=ARCHIVE_PARTITIONING,
+            basename_template="part-{i}.parquet", existing_data_behavior="delete_matching"
+        )
+        archived = ds.dataset(ARCHIVE_DIR, format="parquet", partitioning=ARCHIVE_PARTITIONING).count_rows(
+            filter=ds.field("month") == month_key
+        )
+        if archived != len(rows):
+            logging.error(f"❌ {partition}: จำนวนแถวใน Parquet ({archived}) ไม่ตรงกับฐานข้อมูล ({len(rows)}) ไม่ลบ partition")
+            return False
+        logging.info(f"📦 {partition} → {ARCHIVE_DIR}/month={month_key} ({len(rows)} แถว, {time.monotonic() - started:.1f}s)")
+
+    cur.close()
+    if drop:
+        if not drop_partition(conn, partition, provinces):
+            return False
+        logging.info(f"🗑️ ลบ partition {partition} ออกจาก PostgreSQL แล้ว")
+    return True
+
+
+def archive_closed_months(keep_months=0, drop=False):
+    """ย้ายทุกเดือนที่จบไปแล้ว ยกเว้น keep_months เดือนล่าสุดที่ต้องการเก็บไว้ใน PostgreSQL ด้วย"""
+    today = datetime.now(BANGKOK_TZ).date()
+    cutoff = today.replace(day=1)
+    for _ in range(keep_months):
+        cutoff = (cutoff - timedelta(days=1)).replace(day=1)
+
+    conn = None
+    try:
+        conn = psycopg2.connect(DATABASE_URL)
+        partitions = [(month, name) for month, name in list_monthly_partitions(conn.cursor()) if month < cutoff]
+        if not partitions:
+            logging.info("✅ ไม่มีเดือนที่ต้องย้ายไป archive")
+            return
+        for month, name in partitions:
+            archive_partition(conn, month, name, drop=drop)
+    except psycopg2.Error as e:
+        logging.error(f"❌ เกิดข้อผิดพลาดระหว่างย้ายข้อมูลไป archive: {e}")
+    finally:
+        if conn:
+            conn.close()
+
+# --- 4. MAIN EXECUTION BLOCK ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ย้ายข้อมูลเดือนที่ปิดแล้วไปเก็บเป็น Parquet")
+    parser.add_argument(
+        "--keep-months", type=int, default=0,
+        help="จำนวนเดือนที่จบแล้วล่าสุดที่ยังเก็บไว้ใน PostgreSQL (ค่าเริ่มต้น 0)"
+    )
+    parser.add_argument(
+        "--drop", action="store_true",
+        help="ลบ partition ออกจาก PostgreSQL หลังเขียน Parquet และตรวจจำนวนแถวแล้ว"
+    )
+    args = parser.parse_args()
+
+    logging.info(f"🚀 เริ่มย้ายข้อมูลไปยัง {ARCHIVE_DIR} ...")
+    archive_closed_months(args.keep_months, args.drop)
+    logging.info("✅ เสร็จสิ้นการย้ายข้อมูลไป archive")
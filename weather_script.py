@@ -3,13 +3,27 @@
 # ปรับปรุงสำหรับรันบน GitHub Actions
 # ==============================================================================
 
+import argparse
+import csv
+import hashlib
+import io
+import json
 import logging
 import os
-import time # เพิ่มเข้ามาใหม่เพื่อหน่วงเวลา
-from datetime import datetime
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 import psycopg2
+import psycopg2.errors
+import psycopg2.pool
 import requests
+import schedule
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, disable_created_metrics, write_to_textfile
 
 # --- 1. SETUP LOGGING ---
 logging.basicConfig(
@@ -28,6 +42,7 @@ logging.info("โหลดตัวแปรจากไฟล์ .env สำเ
 DATABASE_URL = os.getenv("DATABASE_URL")
 TMD_TOKEN = os.getenv("TMD_TOKEN")
 TABLE_NAME = os.getenv("TABLE_NAME", "Weather") # ใช้ค่า "Weather" เป็น default
+INGEST_CHANNEL = os.getenv("INGEST_CHANNEL", "weather_ingest") # ช่อง NOTIFY ที่ API ใช้ล้าง cache
 
 # ตรวจสอบว่าโหลดตัวแปรที่จำเป็นสำเร็จหรือไม่
 if not DATABASE_URL or not TMD_TOKEN:
@@ -43,6 +58,13 @@ cond_dict = {
     5: "ฝนตกเล็กน้อย (Light rain)", 6: "ฝนปานกลาง (Moderate rain)", 7: "ฝนตกหนัก (Heavy rain)", 8: "ฝนฟ้าคะนอง (Thunderstorm)",
     9: "อากาศหนาวจัด (Very cold)", 10: "อากาศหนาว (Cold)", 11: "อากาศเย็น (Cool)", 12: "อากาศร้อนจัด (Very hot)"
 }
+UNKNOWN_CONDITION_ID = 0
+UNKNOWN_CONDITION = "ไม่ทราบ"
+
+# เวลาทั้งหมดอ้างอิงเวลาประเทศไทย (ไม่มี daylight saving จึงใช้ offset คงที่ได้)
+LOCAL_TZ = "Asia/Bangkok"
+LOCAL_UTC_OFFSET = "+07:00"
+BANGKOK_TZ = timezone(timedelta(hours=7))
 provinces = [
     "กรุงเทพมหานคร", "กระบี่", "กาญจนบุรี", "กาฬสินธุ์", "กำแพงเพชร", "ขอนแก่น", "จันทบุรี", "ฉะเชิงเทรา", "ชลบุรี", "ชัยนาท",
     "ชัยภูมิ", "ชุมพร", "เชียงราย", "เชียงใหม่", "ตรัง", "ตราด", "ตาก", "นครนายก", "นครปฐม", "นครพนม", "นครราชสีมา",
@@ -53,34 +75,415 @@ provinces = [
     "สระแก้ว", "สระบุรี", "สิงห์บุรี", "สุโขทัย", "สุพรรณบุรี", "สุราษฎร์ธานี", "สุรินทร์", "หนองคาย", "หนองบัวลำภู",
     "อ่างทอง", "อำนาจเจริญ", "อุดรธานี", "อุตรดิตถ์", "อุทัยธานี", "อุบลราชธานี"
 ]
-API_URL = "https://data.tmd.go.th/nwpapi/v1/forecast/location/hourly/place"
+API_URL = os.getenv("TMD_API_URL", "https://data.tmd.go.th/nwpapi/v1/forecast/location/hourly/place")
 API_HEADERS = {
     "accept": "application/json",
     "authorization": f"Bearer {TMD_TOKEN}"
 }
 API_PARAMS_TEMPLATE = { "fields": "tc,rh,cond" }
 
-# --- 5. DATABASE FUNCTIONS ---
+# ค่าควบคุมการเรียก API: จำนวนคำขอพร้อมกัน, โควตาคำขอต่อวินาที และการลองใหม่
+FETCH_CONCURRENCY = int(os.getenv("TMD_CONCURRENCY", "8"))
+FETCH_RATE_PER_SEC = float(os.getenv("TMD_RATE_LIMIT", "2"))
+FETCH_RATE_BURST = int(os.getenv("TMD_RATE_BURST", "2"))
+FETCH_MAX_RETRIES = int(os.getenv("TMD_MAX_RETRIES", "3"))
+FETCH_BACKOFF_BASE = float(os.getenv("TMD_BACKOFF_BASE", "1.0"))
+FETCH_BACKOFF_MAX = 30.0
+FETCH_TIMEOUT = 15
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+# --- 5. METRICS & PROFILING ---
+# ตั้ง METRICS_TEXTFILE เป็นไฟล์ .prom ในโฟลเดอร์ของ textfile collector (node_exporter) เพื่อเขียน metrics หลังจบแต่ละรอบ
+METRICS_TEXTFILE = os.getenv("METRICS_TEXTFILE")
+PROFILE_INTERVAL = float(os.getenv("COLLECTOR_PROFILE_INTERVAL", "0.01"))
+
+# ไม่ต้องเขียน series *_created เพราะไฟล์ถูกเขียนใหม่ทุกรอบอยู่แล้ว
+disable_created_metrics()
+metrics_registry = CollectorRegistry()
+FETCH_SECONDS = Histogram(
+    "weather_collector_fetch_seconds", "เวลาดึงข้อมูลของแต่ละจังหวัด (รวมการลองใหม่)",
+    ["province", "outcome"], registry=metrics_registry,
+    buckets=(.1, .25, .5, 1, 2.5, 5, 10, 30, 60)
+)
+FETCH_RETRIES = Counter(
+    "weather_collector_fetch_retries", "จำนวนครั้งที่ลองเรียก TMD API ใหม่", ["province"], registry=metrics_registry
+)
+ROWS_PARSED = Counter(
+    "weather_collector_rows_parsed", "จำนวนแถวพยากรณ์ที่แปลงได้", ["province"], registry=metrics_registry
+)
+INGEST_SECONDS = Histogram(
+    "weather_collector_ingest_seconds", "เวลาบันทึกข้อมูลหนึ่งรอบลง DB", registry=metrics_registry,
+    buckets=(.1, .25, .5, 1, 2.5, 5, 10, 30, 60)
+)
+INGEST_ROWS = Counter(
+    "weather_collector_ingest_rows", "จำนวนแถวที่บันทึก แยกตามผลลัพธ์", ["result"], registry=metrics_registry
+)
+INGEST_FAILURES = Counter(
+    "weather_collector_ingest_failures", "จำนวนรอบที่บันทึกลง DB ไม่สำเร็จ", registry=metrics_registry
+)
+LAST_RUN = Gauge(
+    "weather_collector_last_run_timestamp_seconds", "เวลาที่จบรอบการเก็บข้อมูลล่าสุด", registry=metrics_registry
+)
+
+
+def write_metrics():
+    if not METRICS_TEXTFILE:
+        return
+    LAST_RUN.set_to_current_time()
+    try:
+        # write_to_textfile เขียนไฟล์ชั่วคราวแล้ว rename ให้ node_exporter ไม่อ่านเจอไฟล์ครึ่งๆ
+        write_to_textfile(METRICS_TEXTFILE, metrics_registry)
+    except OSError as e:
+        logging.warning(f"⚠️ เขียน metrics ลง {METRICS_TEXTFILE} ไม่ได้: {e}")
+
+
+class StackSampler:
+    """
+    sampling profiler ในตัว: เก็บ stack ของทุกเธรดทุก interval วินาทีจาก sys._current_frames()
+    รวมเธรดใน ThreadPoolExecutor ด้วย ผลลัพธ์เป็น collapsed stacks ใช้กับ flamegraph.pl หรือ speedscope ได้
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.counts = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                key = ";".join(reversed(stack))
+                self.counts[key] = self.counts.get(key, 0) + 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self, output_path):
+        self._stop.set()
+        self._thread.join()
+        with open(output_path, "w", encoding="utf-8") as f:
+            for stack, count in sorted(self.counts.items(), key=lambda item: -item[1]):
+                f.write(f"{stack} {count}\n")
+        logging.info(f"🔬 บันทึกผล profiler ({sum(self.counts.values())} samples) ลง {output_path}")
+
+# --- 6. HTTP FETCH ENGINE ---
+class TokenBucket:
+    """ตัวจำกัดอัตราการเรียก API แบบ token bucket ใช้ร่วมกันได้ทุกเธรด"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def create_http_session():
+    """สร้าง Session แบบ keep-alive ที่มี connection pool พอสำหรับทุกเธรด"""
+    session = requests.Session()
+    session.headers.update(API_HEADERS)
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=FETCH_CONCURRENCY)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def _backoff_delay(attempt, retry_after=None):
+    if retry_after:
+        try:
+            return min(float(retry_after), FETCH_BACKOFF_MAX)
+        except ValueError:
+            pass
+    delay = FETCH_BACKOFF_BASE * (2 ** attempt)
+    return min(delay * random.uniform(0.5, 1.5), FETCH_BACKOFF_MAX)
+
+
+def fetch_province(session, limiter, province):
+    """ดึง payload ของจังหวัดเดียว ลองใหม่แบบ jittered backoff เมื่อเจอข้อผิดพลาดชั่วคราว"""
+    params = API_PARAMS_TEMPLATE.copy()
+    params["province"] = province
+    error = None
+    started = time.perf_counter()
+    for attempt in range(FETCH_MAX_RETRIES + 1):
+        limiter.acquire()
+        retry_after = None
+        try:
+            response = session.get(API_URL, params=params, timeout=FETCH_TIMEOUT)
+            if response.status_code in RETRYABLE_STATUS:
+                retry_after = response.headers.get("Retry-After")
+            response.raise_for_status()
+            data = response.json()
+            FETCH_SECONDS.labels(province, "ok").observe(time.perf_counter() - started)
+            return data
+        except requests.exceptions.RequestException as e:
+            error = e
+            status = e.response.status_code if e.response is not None else None
+            if status is not None and status not in RETRYABLE_STATUS:
+                break
+        if attempt < FETCH_MAX_RETRIES:
+            FETCH_RETRIES.labels(province).inc()
+            delay = _backoff_delay(attempt, retry_after)
+            logging.info(f"🔁 ลองใหม่ @ {province} (ครั้งที่ {attempt + 1}) ในอีก {delay:.1f}s: {error}")
+            time.sleep(delay)
+    FETCH_SECONDS.labels(province, "failed").observe(time.perf_counter() - started)
+    logging.warning(f"API Request Error @ {province}: {error}. Skipping...")
+    return None
+
+
+def parse_forecasts(data):
+    forecasts = data["WeatherForecasts"][0]["forecasts"]
+    location = data["WeatherForecasts"][0]["location"]
+    rows = []
+    for item in forecasts:
+        dt = datetime.fromisoformat(item["time"])
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=BANGKOK_TZ)
+        cond_code = item["data"].get("cond")
+        cond_id = cond_code if cond_code in cond_dict else UNKNOWN_CONDITION_ID
+        rows.append((
+            location.get("province"), dt,
+            item["data"].get("tc"), item["data"].get("rh"), cond_id
+        ))
+    return rows
+
+
+def fetch_all_provinces(province_list, session=None, limiter=None):
+    """
+    ดึงข้อมูลทุกจังหวัดพร้อมกันภายใต้ขีดจำกัด concurrency และ rate limit เดียวกัน
+    ส่ง session/limiter เข้ามาเพื่อใช้ซ้ำข้ามรอบ (daemon) ถ้าไม่ส่งจะสร้างใหม่แล้วปิดเมื่อเสร็จ
+    """
+    limiter = limiter or TokenBucket(FETCH_RATE_PER_SEC, FETCH_RATE_BURST)
+    owns_session = session is None
+    session = session or create_http_session()
+    try:
+        with ThreadPoolExecutor(max_workers=FETCH_CONCURRENCY) as executor:
+            payloads = executor.map(lambda p: fetch_province(session, limiter, p), province_list)
+            return dict(zip(province_list, payloads))
+    finally:
+        if owns_session:
+            session.close()
+
+# --- 7. DATABASE FUNCTIONS ---
+# daemon จะตั้งค่า pool ไว้ใช้ connection ซ้ำ ส่วนการรันครั้งเดียวจะเปิด/ปิด connection ตามปกติ
+db_pool = None
+
+def get_db_connection():
+    if db_pool is None:
+        return psycopg2.connect(DATABASE_URL)
+    return db_pool.getconn()
+
+
+def release_db_connection(conn):
+    if db_pool is None:
+        conn.close()
+        return
+    if not conn.closed:
+        conn.rollback() # ทิ้ง transaction ที่ค้างอยู่ก่อนคืน connection เข้า pool
+    db_pool.putconn(conn, close=bool(conn.closed))
+
+# ตารางหลักเก็บจังหวัดและสภาพอากาศเป็นรหัสตัวเลขอ้างอิงตาราง lookup
+# เวลาเก็บเป็น timestamptz คอลัมน์เดียว และแบ่ง partition รายเดือน (ตามเวลาประเทศไทย)
+PROVINCE_TABLE = f"{TABLE_NAME}_province"
+CONDITION_TABLE = f"{TABLE_NAME}_condition"
+LEGACY_TABLE = f"{TABLE_NAME}_legacy"
+WEATHER_COLUMNS = '"Province_id", "Observed_at", "Temperature_c", "Humidity_percent", "Condition_id"'
+# การสร้าง partition ล็อกตารางหลักแบบ ACCESS EXCLUSIVE จึงจำกัดเวลารอล็อก ไม่ให้คิวล็อกไปขวางการอ่านของ API
+PARTITION_LOCK_TIMEOUT = os.getenv("PARTITION_LOCK_TIMEOUT", "5s")
+PARTITION_LOCK_RETRIES = int(os.getenv("PARTITION_LOCK_RETRIES", "3"))
+
+# คอลัมน์สถิติของตาราง rollup เก็บผลรวมและจำนวนไว้ เพื่อให้รวมรายวันเป็นรายเดือนแล้วหาค่าเฉลี่ยได้ถูกต้อง
+ROLLUP_COLUMNS_DDL = """
+                "Temp_min" REAL,
+                "Temp_max" REAL,
+                "Temp_sum" DOUBLE PRECISION,
+                "Temp_count" INTEGER NOT NULL,
+                "Humidity_min" REAL,
+                "Humidity_max" REAL,
+                "Humidity_sum" DOUBLE PRECISION,
+                "Humidity_count" INTEGER NOT NULL,
+                "Hours" INTEGER NOT NULL"""
+
+def create_weather_table(cur, table):
+    # PRIMARY KEY ใช้ INCLUDE ให้เป็น covering index ของรูปแบบ (จังหวัด, เวลาล่าสุดก่อน)
+    # จึงอ่านแบบ index-only scan ย้อนหลังได้โดยไม่ต้องมี index ซ้ำอีกชุด
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS "{table}" (
+            "Province_id" SMALLINT NOT NULL REFERENCES "{PROVINCE_TABLE}" ("id"),
+            "Observed_at" TIMESTAMPTZ NOT NULL,
+            "Temperature_c" REAL,
+            "Humidity_percent" REAL,
+            "Condition_id" SMALLINT REFERENCES "{CONDITION_TABLE}" ("id"),
+            CONSTRAINT "{TABLE_NAME}_observation_pkey" PRIMARY KEY ("Province_id", "Observed_at")
+                INCLUDE ("Temperature_c", "Humidity_percent", "Condition_id")
+        ) PARTITION BY RANGE ("Observed_at");
+    """)
+
+
+def create_lookup_tables(cur):
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS "{PROVINCE_TABLE}" (
+            "id" SMALLINT PRIMARY KEY,
+            "Name" TEXT NOT NULL UNIQUE
+        );
+        CREATE TABLE IF NOT EXISTS "{CONDITION_TABLE}" (
+            "id" SMALLINT PRIMARY KEY,
+            "Description" TEXT NOT NULL UNIQUE
+        );
+        INSERT INTO "{PROVINCE_TABLE}" ("id", "Name")
+        SELECT * FROM unnest(%s::smallint[], %s::text[])
+        ON CONFLICT DO NOTHING;
+        INSERT INTO "{CONDITION_TABLE}" ("id", "Description")
+        SELECT * FROM unnest(%s::smallint[], %s::text[])
+        ON CONFLICT DO NOTHING;
+    """, (
+        list(range(1, len(provinces) + 1)), provinces,
+        [UNKNOWN_CONDITION_ID, *cond_dict], [UNKNOWN_CONDITION, *cond_dict.values()],
+    ))
+
+
+def register_province_names(cur, source):
+    """เพิ่มชื่อจังหวัดที่ยังไม่มีในตาราง lookup (เช่นชื่อที่ TMD สะกดต่างไป) ต่อท้ายรหัสเดิม"""
+    cur.execute(f"""
+        INSERT INTO "{PROVINCE_TABLE}" ("id", "Name")
+        SELECT (SELECT coalesce(max("id"), 0) FROM "{PROVINCE_TABLE}") + row_number() OVER (ORDER BY s.name), s.name
+        FROM (SELECT DISTINCT "Province" AS name FROM {source} WHERE "Province" IS NOT NULL) AS s
+        WHERE NOT EXISTS (SELECT 1 FROM "{PROVINCE_TABLE}" p WHERE p."Name" = s.name)
+        ON CONFLICT DO NOTHING;
+    """)
+
+
+def ensure_partitions(cur, months, parent=TABLE_NAME):
+    """สร้าง partition รายเดือนที่ยังไม่มี months คือวันที่ 1 ของแต่ละเดือน"""
+    for month in sorted(set(months)):
+        # ข้าม partition ที่มีอยู่แล้วโดยไม่แตะตารางหลัก (CREATE ... IF NOT EXISTS ก็ยังต้องขอล็อก)
+        cur.execute("SELECT to_regclass(%s);", (f'"{TABLE_NAME}_p{month:%Y%m}"',))
+        if cur.fetchone()[0] is not None:
+            continue
+        next_month = (month + timedelta(days=32)).replace(day=1)
+        cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS "{TABLE_NAME}_p{month:%Y%m}" PARTITION OF "{parent}"
+            FOR VALUES FROM ('{month.isoformat()} 00:00:00{LOCAL_UTC_OFFSET}')
+            TO ('{next_month.isoformat()} 00:00:00{LOCAL_UTC_OFFSET}');
+        """)
+
+
+def upcoming_months():
+    """วันที่ 1 ของเดือนปัจจุบันและเดือนถัดไป (เวลาประเทศไทย) ซึ่งข้อมูลพยากรณ์รอบถัดไปจะตกอยู่"""
+    this_month = datetime.now(BANGKOK_TZ).date().replace(day=1)
+    return [this_month, (this_month + timedelta(days=32)).replace(day=1)]
+
+
+def prepare_partitions(months):
+    """
+    สร้าง partition ล่วงหน้าใน transaction สั้นๆ ของตัวเองพร้อม lock_timeout
+    ถ้ารอล็อกไม่ได้ (เช่นมี export ที่เปิด transaction ค้างอยู่) จะยอมแพ้แล้วลองใหม่ แทนการต่อคิวขวางผู้อ่านทั้งหมด
+    คืน True เมื่อทุกเดือนมี partition แล้ว
+    """
+    for attempt in range(PARTITION_LOCK_RETRIES):
+        conn = get_db_connection()
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT set_config('lock_timeout', %s, true);", (PARTITION_LOCK_TIMEOUT,))
+            ensure_partitions(cur, months)
+            conn.commit()
+            cur.close()
+            return True
+        except psycopg2.errors.LockNotAvailable:
+            conn.rollback()
+            logging.warning(
+                f"⏳ รอล็อกตาราง \"{TABLE_NAME}\" เพื่อสร้าง partition ไม่ทัน ({attempt + 1}/{PARTITION_LOCK_RETRIES})"
+            )
+            time.sleep(_backoff_delay(attempt))
+        except psycopg2.Error as e:
+            logging.error(f"❌ สร้าง partition ไม่สำเร็จ: {e}")
+            return False
+        finally:
+            release_db_connection(conn)
+    return False
+
+
+def is_legacy_schema(cur):
+    cur.execute("""
+        SELECT EXISTS (
+            SELECT 1 FROM information_schema.columns
+            WHERE table_schema = current_schema() AND table_name = %s AND column_name = 'Province'
+        );
+    """, (TABLE_NAME,))
+    return cur.fetchone()[0]
+
+
 def check_and_create_table_if_needed():
     conn = None
     try:
         conn = psycopg2.connect(DATABASE_URL)
         cur = conn.cursor()
+        if is_legacy_schema(cur):
+            logging.critical(
+                f"❌ ตาราง \"{TABLE_NAME}\" ยังเป็นโครงสร้างแบบเดิม กรุณารัน `python weather_script.py --migrate-schema` ก่อน"
+            )
+            exit(1)
+        create_lookup_tables(cur)
+        create_weather_table(cur, TABLE_NAME)
         cur.execute(f"""
-            CREATE TABLE IF NOT EXISTS "{TABLE_NAME}" (
-                "id" SERIAL PRIMARY KEY,
+            CREATE TABLE IF NOT EXISTS "{TABLE_NAME}_ingest" (
+                "id" BIGSERIAL PRIMARY KEY,
+                "Ingested_at" TIMESTAMPTZ NOT NULL DEFAULT now(),
+                "Provinces" TEXT[] NOT NULL,
+                "Inserted" INTEGER NOT NULL,
+                "Updated" INTEGER NOT NULL,
+                "Unchanged" INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS "{TABLE_NAME}_daily" (
+                "Province" TEXT,
+                "Date" DATE,
+                {ROLLUP_COLUMNS_DDL},
+                PRIMARY KEY ("Province", "Date")
+            );
+            CREATE TABLE IF NOT EXISTS "{TABLE_NAME}_daily_condition" (
                 "Province" TEXT,
                 "Date" DATE,
-                "Time" TIME,
-                "Temperature_c" REAL,
-                "Humidity_percent" REAL,
                 "Condition" TEXT,
-                UNIQUE ("Province", "Date", "Time")
+                "Hours" INTEGER NOT NULL,
+                PRIMARY KEY ("Province", "Date", "Condition")
+            );
+            CREATE TABLE IF NOT EXISTS "{TABLE_NAME}_monthly" (
+                "Province" TEXT,
+                "Month" DATE,
+                {ROLLUP_COLUMNS_DDL},
+                PRIMARY KEY ("Province", "Month")
+            );
+            CREATE TABLE IF NOT EXISTS "{TABLE_NAME}_monthly_condition" (
+                "Province" TEXT,
+                "Month" DATE,
+                "Condition" TEXT,
+                "Hours" INTEGER NOT NULL,
+                PRIMARY KEY ("Province", "Month", "Condition")
             );
         """)
         conn.commit()
         cur.close()
         logging.info(f"✅ ตาราง \"{TABLE_NAME}\" พร้อมแล้ว.")
+        prepare_partitions(upcoming_months())
     except psycopg2.Error as e:
         logging.critical(f"❌ เกิดปัญหา: ไม่สามารถสร้างตารางได้: {e}")
         exit(1)
@@ -88,60 +491,452 @@ def check_and_create_table_if_needed():
         if conn:
             conn.close()
 
-# --- 6. DATA COLLECTION FUNCTION ---
+
+def migrate_schema(batch_size=50000):
+    """
+    ย้ายข้อมูลจากตารางแบบเดิม (ชื่อจังหวัด/สภาพอากาศเป็น TEXT, แยก DATE/TIME) ไปยังโครงสร้างใหม่
+    คัดลอกทีละช่วง id แล้ว commit ทีละ batch รันซ้ำได้อย่างปลอดภัย (ON CONFLICT DO NOTHING)
+    ขั้นสุดท้ายล็อกตารางเดิม คัดลอกแถวที่เพิ่มเข้ามาระหว่างย้าย แล้วสลับชื่อตารางใน transaction เดียว
+    """
+    new_table = f"{TABLE_NAME}_new"
+    conn = None
+    try:
+        conn = psycopg2.connect(DATABASE_URL)
+        cur = conn.cursor()
+        if not is_legacy_schema(cur):
+            logging.info(f"✅ ตาราง \"{TABLE_NAME}\" เป็นโครงสร้างใหม่อยู่แล้ว ไม่ต้องย้ายข้อมูล")
+            return
+        create_lookup_tables(cur)
+        register_province_names(cur, f'"{TABLE_NAME}"')
+        create_weather_table(cur, new_table)
+        cur.execute(f'SELECT DISTINCT date_trunc(\'month\', "Date")::date FROM "{TABLE_NAME}" WHERE "Date" IS NOT NULL;')
+        ensure_partitions(cur, [month for month, in cur.fetchall()], parent=new_table)
+        cur.execute(f'SELECT coalesce(min("id"), 0), coalesce(max("id"), 0) FROM "{TABLE_NAME}";')
+        first_id, last_id = cur.fetchone()
+        conn.commit()
+
+        copy_sql = f"""
+            INSERT INTO "{new_table}" ({WEATHER_COLUMNS})
+            SELECT p."id", (l."Date" + l."Time") AT TIME ZONE '{LOCAL_TZ}',
+                l."Temperature_c", l."Humidity_percent",
+                CASE WHEN l."Condition" IS NULL THEN NULL ELSE coalesce(c."id", {UNKNOWN_CONDITION_ID}) END
+            FROM "{TABLE_NAME}" l
+            JOIN "{PROVINCE_TABLE}" p ON p."Name" = l."Province"
+            LEFT JOIN "{CONDITION_TABLE}" c ON c."Description" = l."Condition"
+            WHERE l."id" >= %s AND l."id" < %s AND l."Date" IS NOT NULL AND l."Time" IS NOT NULL
+            ON CONFLICT DO NOTHING;
+        """
+        started = time.monotonic()
+        copied = 0
+        for start in range(first_id, last_id + 1, batch_size):
+            cur.execute(copy_sql, (start, start + batch_size))
+            copied += cur.rowcount
+            conn.commit()
+            logging.info(f"🚚 ย้ายข้อมูลถึง id {min(start + batch_size - 1, last_id)}/{last_id} ({copied} แถว)")
+
+        # ขั้นสุดท้าย: กันการเขียนระหว่างสลับตาราง แล้วเก็บแถวที่เข้ามาระหว่างย้าย
+        cur.execute(f'LOCK TABLE "{TABLE_NAME}" IN EXCLUSIVE MODE;')
+        register_province_names(cur, f'"{TABLE_NAME}"')
+        cur.execute(f'SELECT DISTINCT date_trunc(\'month\', "Date")::date FROM "{TABLE_NAME}" WHERE "id" > %s AND "Date" IS NOT NULL;', (last_id,))
+        ensure_partitions(cur, [month for month, in cur.fetchall()], parent=new_table)
+        cur.execute(f'SELECT coalesce(max("id"), 0) FROM "{TABLE_NAME}";')
+        cur.execute(copy_sql, (last_id + 1, cur.fetchone()[0] + 1))
+        copied += cur.rowcount
+        cur.execute(f"""
+            ALTER TABLE "{TABLE_NAME}" RENAME TO "{LEGACY_TABLE}";
+            ALTER TABLE "{new_table}" RENAME TO "{TABLE_NAME}";
+        """)
+        conn.commit()
+        cur.close()
+        logging.info(
+            f"✅ ย้ายข้อมูล {copied} แถวสำเร็จ ใช้เวลา {time.monotonic() - started:.1f}s "
+            f"(ตารางเดิมเก็บไว้ที่ \"{LEGACY_TABLE}\" ลบได้เมื่อตรวจสอบแล้ว)"
+        )
+    except psycopg2.Error as e:
+        logging.critical(f"❌ ย้ายข้อมูลไม่สำเร็จ: {e}")
+        exit(1)
+    finally:
+        if conn:
+            conn.close()
+
+
+def refresh_rollups(cur, days=None):
+    """
+    คำนวณตาราง rollup รายวัน/รายเดือนใหม่เฉพาะ (จังหวัด, วันที่) ที่ระบุ และเดือนที่วันเหล่านั้นอยู่
+    ถ้า days=None จะคำนวณใหม่จากข้อมูลรายชั่วโมงทั้งหมด
+    """
+    if days is None:
+        cur.execute(f"""
+            CREATE TEMP TABLE weather_touched ON COMMIT DROP AS
+            SELECT DISTINCT p."Name" AS "Province", (w."Observed_at" AT TIME ZONE '{LOCAL_TZ}')::date AS "Date"
+            FROM "{TABLE_NAME}" w JOIN "{PROVINCE_TABLE}" p ON p."id" = w."Province_id";
+        """)
+    else:
+        cur.execute("""
+            CREATE TEMP TABLE weather_touched ON COMMIT DROP AS
+            SELECT DISTINCT * FROM unnest(%s::text[], %s::date[]) AS t("Province", "Date");
+        """, ([province for province, _ in days], [day for _, day in days]))
+    # แถวรายชั่วโมงของแต่ละ (จังหวัด, วันที่) ที่ถูกแตะ อ่านผ่าน primary key ด้วยช่วงเวลาของวันนั้น
+    touched_rows = f"""
+        FROM weather_touched t
+        JOIN "{PROVINCE_TABLE}" p ON p."Name" = t."Province"
+        JOIN "{TABLE_NAME}" w ON w."Province_id" = p."id"
+            AND w."Observed_at" >= (t."Date"::timestamp AT TIME ZONE '{LOCAL_TZ}')
+            AND w."Observed_at" < ((t."Date" + 1)::timestamp AT TIME ZONE '{LOCAL_TZ}')
+    """
+    cur.execute(f"""
+        DELETE FROM "{TABLE_NAME}_daily" r
+        USING weather_touched t WHERE r."Province" = t."Province" AND r."Date" = t."Date";
+        INSERT INTO "{TABLE_NAME}_daily"
+        SELECT t."Province", t."Date",
+            min(w."Temperature_c"), max(w."Temperature_c"), sum(w."Temperature_c"), count(w."Temperature_c"),
+            min(w."Humidity_percent"), max(w."Humidity_percent"), sum(w."Humidity_percent"), count(w."Humidity_percent"),
+            count(*)
+        {touched_rows}
+        GROUP BY t."Province", t."Date";
+
+        DELETE FROM "{TABLE_NAME}_daily_condition" r
+        USING weather_touched t WHERE r."Province" = t."Province" AND r."Date" = t."Date";
+        INSERT INTO "{TABLE_NAME}_daily_condition"
+        SELECT t."Province", t."Date", c."Description", count(*)
+        {touched_rows}
+        JOIN "{CONDITION_TABLE}" c ON c."id" = w."Condition_id"
+        GROUP BY t."Province", t."Date", c."Description";
+
+        CREATE TEMP TABLE weather_touched_months ON COMMIT DROP AS
+        SELECT DISTINCT "Province", date_trunc('month', "Date")::date AS "Month" FROM weather_touched;
+
+        DELETE FROM "{TABLE_NAME}_monthly" r
+        USING weather_touched_months m WHERE r."Province" = m."Province" AND r."Month" = m."Month";
+        INSERT INTO "{TABLE_NAME}_monthly"
+        SELECT d."Province", m."Month",
+            min(d."Temp_min"), max(d."Temp_max"), sum(d."Temp_sum"), sum(d."Temp_count"),
+            min(d."Humidity_min"), max(d."Humidity_max"), sum(d."Humidity_sum"), sum(d."Humidity_count"),
+            sum(d."Hours")
+        FROM "{TABLE_NAME}_daily" d
+        JOIN weather_touched_months m
+            ON d."Province" = m."Province" AND d."Date" >= m."Month" AND d."Date" < m."Month" + INTERVAL '1 month'
+        GROUP BY d."Province", m."Month";
+
+        DELETE FROM "{TABLE_NAME}_monthly_condition" r
+        USING weather_touched_months m WHERE r."Province" = m."Province" AND r."Month" = m."Month";
+        INSERT INTO "{TABLE_NAME}_monthly_condition"
+        SELECT d."Province", m."Month", d."Condition", sum(d."Hours")
+        FROM "{TABLE_NAME}_daily_condition" d
+        JOIN weather_touched_months m
+            ON d."Province" = m."Province" AND d."Date" >= m."Month" AND d."Date" < m."Month" + INTERVAL '1 month'
+        GROUP BY d."Province", m."Month", d."Condition";
+    """)
+
+def rebuild_rollups():
+    conn = None
+    try:
+        conn = psycopg2.connect(DATABASE_URL)
+        cur = conn.cursor()
+        started = time.monotonic()
+        refresh_rollups(cur)
+        conn.commit()
+        cur.close()
+        logging.info(f"✅ คำนวณตาราง rollup ใหม่ทั้งหมดสำเร็จ ใช้เวลา {time.monotonic() - started:.1f}s")
+    except psycopg2.Error as e:
+        logging.error(f"❌ ไม่สามารถคำนวณตาราง rollup ได้: {e}")
+    finally:
+        if conn:
+            conn.close()
+
+def ingest_rows(rows):
+    """
+    บันทึกข้อมูลทั้งรอบด้วย COPY ลงตาราง staging แล้ว merge เข้าตารางหลักในคำสั่งเดียว
+    แถวที่ค่าพยากรณ์เปลี่ยนจะถูกอัปเดต ส่วนแถวที่ค่าเหมือนเดิมจะไม่ถูกแตะ
+    """
+    started = time.monotonic()
+    # partition ต้องมีก่อนเปิด transaction ของการ merge ซึ่งถือล็อกไว้จนถึง commit
+    # ปกติ prepare_partitions(upcoming_months()) สร้างไว้แล้ว ขั้นนี้จึงแค่ตรวจว่ามีอยู่
+    months = {observed_at.astimezone(BANGKOK_TZ).date().replace(day=1) for _, observed_at, _, _, _ in rows}
+    if not prepare_partitions(months):
+        INGEST_FAILURES.inc()
+        logging.error("❌ ยังไม่มี partition ของเดือนที่จะบันทึก ข้ามการบันทึกรอบนี้")
+        return None
+
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+
+    conn = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        cur.execute("""
+            CREATE TEMP TABLE weather_staging (
+                "Province" TEXT,
+                "Observed_at" TIMESTAMPTZ,
+                "Temperature_c" REAL,
+                "Humidity_percent" REAL,
+                "Condition_id" SMALLINT
+            ) ON COMMIT DROP;
+        """)
+        cur.copy_expert(
+            'COPY weather_staging ("Province", "Observed_at", "Temperature_c", "Humidity_percent", "Condition_id") '
+            'FROM STDIN WITH (FORMAT csv)',
+            buffer
+        )
+        register_province_names(cur, "weather_staging")
+        # partitioned table อ่าน xmax ใน RETURNING ไม่ได้ จึงนับแถวที่มีอยู่แล้วก่อน merge แทน
+        cur.execute(f"""
+            SELECT count(*), count(w."Province_id")
+            FROM (
+                SELECT DISTINCT p."id", s."Observed_at"
+                FROM weather_staging s JOIN "{PROVINCE_TABLE}" p ON p."Name" = s."Province"
+            ) AS k
+            LEFT JOIN "{TABLE_NAME}" w ON w."Province_id" = k."id" AND w."Observed_at" = k."Observed_at";
+        """)
+        incoming, existing = cur.fetchone()
+        cur.execute(f"""
+            INSERT INTO "{TABLE_NAME}" ({WEATHER_COLUMNS})
+            SELECT DISTINCT ON (p."id", s."Observed_at")
+                p."id", s."Observed_at", s."Temperature_c", s."Humidity_percent", s."Condition_id"
+            FROM weather_staging s
+            JOIN "{PROVINCE_TABLE}" p ON p."Name" = s."Province"
+            ORDER BY p."id", s."Observed_at"
+            ON CONFLICT ("Province_id", "Observed_at") DO UPDATE SET
+                "Temperature_c" = EXCLUDED."Temperature_c",
+                "Humidity_percent" = EXCLUDED."Humidity_percent",
+                "Condition_id" = EXCLUDED."Condition_id"
+            WHERE ("{TABLE_NAME}"."Temperature_c", "{TABLE_NAME}"."Humidity_percent", "{TABLE_NAME}"."Condition_id")
+                IS DISTINCT FROM (EXCLUDED."Temperature_c", EXCLUDED."Humidity_percent", EXCLUDED."Condition_id")
+            RETURNING "Province_id", ("Observed_at" AT TIME ZONE '{LOCAL_TZ}')::date;
+        """)
+        returned = cur.fetchall()
+        cur.execute(f'SELECT "id", "Name" FROM "{PROVINCE_TABLE}";')
+        province_names = dict(cur.fetchall())
+        changed = [(province_names[province_id], day) for province_id, day in returned]
+        changed_provinces = sorted({province for province, _ in changed})
+        # แถวใหม่ทุกแถวถูก RETURNING เสมอ ส่วนแถวเดิมจะถูก RETURNING เฉพาะเมื่อค่าเปลี่ยน
+        inserted = incoming - existing
+        stats = {
+            "staged": len(rows),
+            "inserted": inserted,
+            "updated": len(changed) - inserted,
+            "unchanged": existing - (len(changed) - inserted),
+        }
+        # บันทึกรอบการ ingest ไว้ใช้เป็นเวอร์ชันของข้อมูล (ETag ฝั่ง API)
+        cur.execute(f"""
+            INSERT INTO "{TABLE_NAME}_ingest" ("Provinces", "Inserted", "Updated", "Unchanged")
+            VALUES (%s, %s, %s, %s)
+            RETURNING "id";
+        """, (changed_provinces, stats["inserted"], stats["updated"], stats["unchanged"]))
+        stats["batch_id"] = cur.fetchone()[0]
+        # อัปเดต rollup เฉพาะวันที่ข้อมูลรอบนี้เปลี่ยน ใน transaction เดียวกับการ merge
+        if changed:
+            refresh_rollups(cur, changed)
+        if changed_provinces:
+            # NOTIFY จะถูกส่งออกไปก็ต่อเมื่อ commit สำเร็จเท่านั้น
+            cur.execute(
+                "SELECT pg_notify(%s, %s);",
+                (INGEST_CHANNEL, json.dumps(
+                    {"batch_id": stats["batch_id"], "provinces": changed_provinces}, ensure_ascii=False
+                ))
+            )
+        conn.commit()
+        cur.close()
+    except psycopg2.Error as e:
+        INGEST_FAILURES.inc()
+        logging.error(f"❌ เกิดข้อผิดพลาดในการบันทึกลงใน DB: {e}")
+        return None
+    finally:
+        if conn:
+            release_db_connection(conn)
+
+    stats["seconds"] = time.monotonic() - started
+    INGEST_SECONDS.observe(stats["seconds"])
+    for result in ("inserted", "updated", "unchanged"):
+        INGEST_ROWS.labels(result).inc(stats[result])
+    logging.info(
+        f"✅ บันทึกข้อมูลสำเร็จ: เพิ่มใหม่ {stats['inserted']}, อัปเดต {stats['updated']}, "
+        f"ไม่เปลี่ยนแปลง {stats['unchanged']} แถว ใช้เวลา {stats['seconds']:.2f}s"
+    )
+    return stats
+
+# --- 8. DATA COLLECTION FUNCTION ---
 def collect_weather_data():
     logging.info("📥 กำลังเริ่มกระบวนการรวบรวมข้อมูล...")
+    started = time.monotonic()
+    payloads = fetch_all_provinces(provinces)
     rows_to_insert = []
-    for province in provinces:
-        params = API_PARAMS_TEMPLATE.copy()
-        params["province"] = province
+    fetched = 0
+    for province, data in payloads.items():
+        if data is None:
+            continue
         try:
-            response = requests.get(API_URL, headers=API_HEADERS, params=params, timeout=15)
-            response.raise_for_status()
-            data = response.json()
-            forecasts = data["WeatherForecasts"][0]["forecasts"]
-            location = data["WeatherForecasts"][0]["location"]
-            for item in forecasts:
-                dt = datetime.fromisoformat(item["time"])
-                cond_code = item["data"].get("cond")
-                cond_desc = cond_dict.get(cond_code, "ไม่ทราบ")
-                rows_to_insert.append((
-                    location.get("province"), dt.date(), dt.time(),
-                    item["data"].get("tc"), item["data"].get("rh"), cond_desc
-                ))
-        except requests.exceptions.RequestException as e:
-            logging.warning(f"API Request Error @ {province}: {e}. Skipping...")
+            rows = parse_forecasts(data)
+            ROWS_PARSED.labels(province).inc(len(rows))
+            rows_to_insert.extend(rows)
+            fetched += 1
         except (KeyError, IndexError, ValueError) as e:
             logging.warning(f"JSON Parsing Error @ {province}: {e}. Skipping...")
-
-        # หน่วงเวลาเพื่อป้องกันการเรียก API ถี่เกินไป
-        time.sleep(1.5)
+    logging.info(f"📦 ดึงข้อมูลสำเร็จ {fetched}/{len(provinces)} จังหวัด ใช้เวลา {time.monotonic() - started:.1f}s")
 
     if rows_to_insert:
-        conn = None
-        try:
-            conn = psycopg2.connect(DATABASE_URL)
-            cur = conn.cursor()
-            insert_query = f"""
-                INSERT INTO "{TABLE_NAME}" ("Province", "Date", "Time", "Temperature_c", "Humidity_percent", "Condition")
-                VALUES (%s, %s, %s, %s, %s, %s)
-                ON CONFLICT ("Province", "Date", "Time") DO NOTHING;
-            """
-            cur.executemany(insert_query, rows_to_insert)
-            conn.commit()
-            logging.info(f"✅ แทรก/อัปเดตแถว {cur.rowcount} สำเร็จแล้ว")
-            cur.close()
-        except psycopg2.Error as e:
-            logging.error(f"❌ เกิดข้อผิดพลาดในการบันทึกลงใน DB: {e}")
-        finally:
-            if conn:
-                conn.close()
+        ingest_rows(rows_to_insert)
     else:
         logging.warning("⚠️ ไม่มีข้อมูลที่จะแทรกหลังการรวบรวมข้อมูล")
+    write_metrics()
+
+# --- 9. DAEMON MODE ---
+DAEMON_TICK_SECONDS = int(os.getenv("DAEMON_TICK_SECONDS", "60"))
+DAEMON_BASE_INTERVAL = int(os.getenv("DAEMON_BASE_INTERVAL", "3600"))
+DAEMON_MAX_INTERVAL = int(os.getenv("DAEMON_MAX_INTERVAL", "21600"))
+DAEMON_RETRY_SECONDS = int(os.getenv("DAEMON_RETRY_SECONDS", "300"))
+DAEMON_DB_POOL_MAX = int(os.getenv("DAEMON_DB_POOL_MAX", "2"))
+COLLECTOR_CHECKPOINT = os.getenv("COLLECTOR_CHECKPOINT", "collector_checkpoint.json")
+
+
+def payload_hash(data):
+    return hashlib.sha256(json.dumps(data, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+
+
+class CollectorDaemon:
+    """
+    ตัวเก็บข้อมูลแบบรันต่อเนื่อง ถือ HTTP session และ DB connection pool ไว้ตลอด
+    แต่ละจังหวัดมีรอบตรวจของตัวเอง: ถ้า payload เหมือนครั้งก่อนจะยืดรอบออกไป (สูงสุด DAEMON_MAX_INTERVAL)
+    และบันทึกลง DB เฉพาะจังหวัดที่ payload เปลี่ยน สถานะทั้งหมดเก็บใน checkpoint เพื่อทำงานต่อหลัง crash
+    """
+
+    def __init__(self, checkpoint_path):
+        self.checkpoint_path = checkpoint_path
+        self.state = self.load_checkpoint()
+        self.session = create_http_session()
+        self.limiter = TokenBucket(FETCH_RATE_PER_SEC, FETCH_RATE_BURST)
+
+    def load_checkpoint(self):
+        try:
+            with open(self.checkpoint_path, encoding="utf-8") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logging.warning(f"⚠️ อ่าน checkpoint {self.checkpoint_path} ไม่ได้ ({e}) เริ่มตรวจทุกจังหวัดใหม่")
+            return {}
+        logging.info(f"♻️ กู้คืนสถานะจาก checkpoint {self.checkpoint_path} ({len(state)} จังหวัด)")
+        return state
+
+    def save_checkpoint(self):
+        # เขียนไฟล์ชั่วคราวแล้ว rename เพื่อไม่ให้ checkpoint เสียถ้า process ตายกลางทาง
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, ensure_ascii=False)
+        os.replace(tmp_path, self.checkpoint_path)
 
-# --- 7. MAIN EXECUTION BLOCK ---
+    def run_due(self):
+        now = time.time()
+        due = [p for p in provinces if self.state.get(p, {}).get("next_due", 0) <= now]
+        if not due:
+            return
+        prepare_partitions(upcoming_months())
+
+        payloads = fetch_all_provinces(due, self.session, self.limiter)
+        rows_to_insert = []
+        changed = {}
+        unchanged = failed = 0
+        for province, data in payloads.items():
+            entry = self.state.setdefault(province, {"interval": DAEMON_BASE_INTERVAL})
+            if data is None:
+                entry["next_due"] = now + DAEMON_RETRY_SECONDS
+                failed += 1
+                continue
+            digest = payload_hash(data)
+            if digest == entry.get("hash"):
+                entry["interval"] = min(entry.get("interval", DAEMON_BASE_INTERVAL) * 2, DAEMON_MAX_INTERVAL)
+                entry["next_due"] = now + entry["interval"]
+                unchanged += 1
+                continue
+            try:
+                rows = parse_forecasts(data)
+            except (KeyError, IndexError, ValueError) as e:
+                logging.warning(f"JSON Parsing Error @ {province}: {e}. Skipping...")
+                entry["next_due"] = now + DAEMON_RETRY_SECONDS
+                failed += 1
+                continue
+            ROWS_PARSED.labels(province).inc(len(rows))
+            rows_to_insert.extend(rows)
+            changed[province] = digest
+
+        if rows_to_insert and ingest_rows(rows_to_insert) is None:
+            # บันทึกไม่สำเร็จ: ยังไม่จำ hash เพื่อให้รอบหน้าดึงและบันทึกจังหวัดเหล่านี้ใหม่
+            for province in changed:
+                self.state[province]["next_due"] = now + DAEMON_RETRY_SECONDS
+            failed += len(changed)
+            changed = {}
+        for province, digest in changed.items():
+            self.state[province].update(hash=digest, interval=DAEMON_BASE_INTERVAL, next_due=now + DAEMON_BASE_INTERVAL)
+        self.save_checkpoint()
+        write_metrics()
+        logging.info(
+            f"🔄 ตรวจ {len(due)} จังหวัด: ข้อมูลใหม่ {len(changed)}, ไม่เปลี่ยนแปลง {unchanged}, ล้มเหลว {failed}"
+        )
+
+    def close(self):
+        self.session.close()
+
+
+def run_daemon():
+    global db_pool
+    db_pool = psycopg2.pool.ThreadedConnectionPool(1, DAEMON_DB_POOL_MAX, DATABASE_URL)
+    daemon = CollectorDaemon(COLLECTOR_CHECKPOINT)
+    schedule.every(DAEMON_TICK_SECONDS).seconds.do(daemon.run_due)
+    logging.info(f"🕒 เริ่มโหมด daemon ตรวจจังหวัดที่ถึงรอบทุก {DAEMON_TICK_SECONDS}s")
+    try:
+        daemon.run_due()
+        while True:
+            schedule.run_pending()
+            time.sleep(max(schedule.idle_seconds() or 0, 1))
+    except KeyboardInterrupt:
+        logging.info("🛑 หยุดโหมด daemon")
+    finally:
+        schedule.clear()
+        daemon.close()
+        db_pool.closeall()
+
+# --- 10. MAIN EXECUTION BLOCK ---
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="รวบรวมข้อมูลพยากรณ์อากาศจาก TMD API ลง PostgreSQL")
+    parser.add_argument(
+        "--rebuild-rollups", action="store_true",
+        help="คำนวณตาราง rollup รายวัน/รายเดือนใหม่ทั้งหมดจากข้อมูลรายชั่วโมง แทนการรวบรวมข้อมูล"
+    )
+    parser.add_argument(
+        "--migrate-schema", action="store_true",
+        help="ย้ายข้อมูลจากตารางโครงสร้างเดิมไปยังโครงสร้างใหม่ (รหัสจังหวัด/สภาพอากาศ, partition รายเดือน)"
+    )
+    parser.add_argument(
+        "--daemon", action="store_true",
+        help="รันต่อเนื่อง ตรวจแต่ละจังหวัดตามรอบ และบันทึกเฉพาะจังหวัดที่ข้อมูลเปลี่ยน"
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=50000,
+        help="จำนวน id ต่อ batch ระหว่างย้ายข้อมูล (ค่าเริ่มต้น 50000)"
+    )
+    parser.add_argument(
+        "--profile", metavar="OUTPUT",
+        help="เปิด sampling profiler แล้วเขียน collapsed stacks ลงไฟล์นี้เมื่อจบการทำงาน"
+    )
+    args = parser.parse_args()
+
+    profiler = None
+    if args.profile:
+        profiler = StackSampler(PROFILE_INTERVAL)
+        profiler.start()
+
     logging.info("🚀 เริ่มต้นกระบวนการรวบรวมข้อมูลสภาพอากาศผ่าน GitHub Actions...")
+    if args.migrate_schema:
+        migrate_schema(args.batch_size)
     check_and_create_table_if_needed()
-    collect_weather_data()
+    if args.rebuild_rollups:
+        rebuild_rollups()
+    elif args.daemon:
+        run_daemon()
+    elif not args.migrate_schema:
+        collect_weather_data()
+    if profiler:
+        profiler.stop(args.profile)
     logging.info("✅ เสร็จสิ้นกระบวนการรวบรวมข้อมูลสภาพอากาศแล้ว")
\ No newline at end of file